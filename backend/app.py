@@ -1,12 +1,22 @@
 import os
 import json
-import tempfile
-from flask import Flask, request, jsonify
+import math
+import random
+import threading
+import time
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import logging
 from dotenv import load_dotenv
 import traceback
+from jobs import JobManager, QueueFullError
+from metrics import REGISTRY, REQUESTS, REQUEST_SECONDS
+from timing import StageTimer
+from pdf_extract import parse_page_range, select_pages, page_count
+from question_bank import QuestionBank, document_key
+from generation_profiles import Deadline, PROFILES
+from keyword_extractors import KEYWORD_MODES
 
 # Load environment variables
 load_dotenv()
@@ -24,6 +34,21 @@ CORS(app)  # Enable CORS for all routes
 UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
 ALLOWED_EXTENSIONS = {'pdf', 'txt'}
 
+# Per-chunk result cache; set MCQ_RESULT_CACHE_PATH to an empty value to disable it
+RESULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'results.sqlite')
+
+# Summaries and explanations for lazily explained MCQs; an empty value keeps them in memory only
+EXPLANATION_STORE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'explanations.sqlite')
+
+# Most explanation handles accepted by one /api/explanations request
+MAX_EXPLANATION_HANDLES = 64
+
+# Every MCQ generated per document, served by /api/questions/sample; an empty value disables it
+QUESTION_BANK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'questions.sqlite')
+
+# Most questions returned by one sample request
+MAX_SAMPLE_COUNT = 100
+
 # Create upload folder if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -32,6 +57,34 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max upload size
 
 # Initialize MCQ Generator
 mcq_generator = None
+generator_lock = threading.Lock()
+
+# Progress of loading the generator, reported by /api/ready
+startup_state = {"status": "not_started", "error": None, "timings": None}
+
+# Opened with the API, not the generator, so banked questions are served while the models load
+question_bank_path = os.environ.get('MCQ_QUESTION_BANK_PATH', QUESTION_BANK_PATH)
+question_bank = QuestionBank(question_bank_path) if question_bank_path else None
+
+# Background generation jobs, with bounded concurrency so the box isn't oversubscribed
+job_manager = JobManager(
+    max_workers=int(os.environ.get('MCQ_JOB_WORKERS', 1)),
+    max_queued=int(os.environ.get('MCQ_MAX_QUEUED_JOBS', 20))
+)
+
+def parse_bool(value, default=False):
+    if value is None:
+        return default
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+def request_timer():
+    """Per-request stage timer when the client asked for a timing breakdown with timings=true"""
+    if parse_bool(request.form.get('timings') or request.args.get('timings')):
+        return StageTimer()
+    return None
+
+def timing_breakdown(timer, started):
+    return {"total_seconds": round(time.perf_counter() - started, 4), "stages": timer.snapshot()}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -47,11 +100,27 @@ def check_models_exist():
     ]
     
     missing_models = [model for model in required_models if not os.path.exists(model)]
+
+    # A prebuilt Sense2Vec neighbour table replaces the raw vectors
+    if os.path.exists(os.path.join(models_dir, 's2v_table', 'meta.json')):
+        missing_models = [model for model in missing_models if not model.endswith('s2v_old')]
     
     if missing_models:
         return False, missing_models
     return True, []
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    # Streaming responses are measured up to the start of the stream
+    if request.endpoint and request.endpoint != 'metrics' and request.path.startswith('/api/'):
+        REQUESTS.inc(endpoint=request.endpoint, status=response.status_code)
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, endpoint=request.endpoint)
+    return response
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -66,111 +135,477 @@ def health_check():
     
     return jsonify({"status": "ok", "message": "MCQ Generator API is running"})
 
-@app.route('/api/generate-mcq', methods=['POST'])
-def generate_mcq():
-    """Generate MCQs from uploaded file or text"""
+class UploadedDocument:
+    """Document taken from a request: the bytes of an uploaded PDF or plain text"""
+    def __init__(self, kind, value, source, description, pages=None):
+        self.kind = kind
+        self.value = value
+        self.source = source
+        self.description = description
+        # Page range spec limiting which PDF pages are read
+        self.pages = pages
+        # Question bank id of the document
+        self.key = document_key(value, pages)
+
+    def close(self):
+        # Let the upload be freed even while a finished job is kept for polling
+        self.value = None
+
+class StartupError(Exception):
+    """Raised when the MCQ generator cannot be loaded"""
+    def __init__(self, message, missing_models=None):
+        super().__init__(message)
+        self.missing_models = missing_models
+
+def generator_options():
+    """MCQGenerator settings from the environment"""
+    return {
+        "use_gpu": False,  # Set to True if GPU is available
+        "embedding_cache_mb": float(os.environ.get('MCQ_EMBEDDING_CACHE_MB', 64)),
+        "embedding_cache_path": os.environ.get('MCQ_EMBEDDING_CACHE_PATH') or None,
+        "chunk_workers": int(os.environ.get('MCQ_CHUNK_WORKERS', 0)),
+        "threads_per_worker": int(os.environ.get('MCQ_THREADS_PER_WORKER', 0)) or None,
+        "result_cache_path": os.environ.get('MCQ_RESULT_CACHE_PATH', RESULT_CACHE_PATH) or None,
+        "result_cache_mb": float(os.environ.get('MCQ_RESULT_CACHE_MB', 256)),
+        "use_scheduler": parse_bool(os.environ.get('MCQ_BATCH_SCHEDULER'), default=True),
+        "scheduler_batch_size": int(os.environ.get('MCQ_SCHEDULER_BATCH_SIZE', 16)),
+        "scheduler_wait_ms": float(os.environ.get('MCQ_SCHEDULER_WAIT_MS', 20)),
+        "quantize": os.environ.get('MCQ_QUANTIZE') or None,
+        "intra_op_threads": int(os.environ.get('MCQ_INTRA_OP_THREADS', 0)) or None,
+        "inter_op_threads": int(os.environ.get('MCQ_INTER_OP_THREADS', 0)) or None,
+        "models_dir": os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'),
+        "offline": parse_bool(os.environ.get('MCQ_OFFLINE'), default=True),
+        "explanation_store_path": os.environ.get('MCQ_EXPLANATION_STORE_PATH', EXPLANATION_STORE_PATH) or None,
+        "explanation_store_mb": float(os.environ.get('MCQ_EXPLANATION_STORE_MB', 64)),
+        "keyword_mode": os.environ.get('MCQ_KEYWORD_MODE', 'quality'),
+        "pdf_workers": int(os.environ.get('MCQ_PDF_WORKERS', 0)),
+        "dedup_threshold": float(os.environ.get('MCQ_DEDUP_THRESHOLD', 0.9)),
+        "profile": os.environ.get('MCQ_PROFILE', 'quality')
+    }
+
+def load_generator():
+    """Load, warm up and return the shared MCQ generator, raising StartupError on failure"""
     global mcq_generator
-    
-    # Check if models exist
-    models_exist, missing_models = check_models_exist()
-    if not models_exist:
-        return jsonify({
-            "error": "Required models are missing. Please download the models first.",
-            "missing_models": missing_models
-        }), 500
-    
-    # Import MCQGenerator here to avoid import errors if models are missing
-    try:
-        from mcq_generator import MCQGenerator
-    except Exception as e:
-        logger.error(f"Error importing MCQGenerator: {e}")
-        return jsonify({"error": f"Failed to import MCQGenerator: {str(e)}"}), 500
-    
-    # Initialize MCQ generator if not already done
-    if mcq_generator is None:
+
+    with generator_lock:
+        if mcq_generator is not None:
+            return mcq_generator
+
+        # Check if models exist
+        models_exist, missing_models = check_models_exist()
+        if not models_exist:
+            error = "Required models are missing. Please download the models first."
+            startup_state.update(status="failed", error=error)
+            raise StartupError(error, missing_models)
+
+        startup_state.update(status="loading", error=None)
+        started = time.perf_counter()
+
+        # Import MCQGenerator here so the API starts quickly and can report missing models
+        try:
+            from mcq_generator import MCQGenerator
+        except Exception as e:
+            logger.error(f"Error importing MCQGenerator: {e}")
+            startup_state.update(status="failed", error=str(e))
+            raise StartupError(f"Failed to import MCQGenerator: {str(e)}")
+        import_seconds = time.perf_counter() - started
+
         try:
             logger.info("Initializing MCQ Generator...")
-            mcq_generator = MCQGenerator(use_gpu=False)  # Set to True if GPU is available
+            generator = MCQGenerator(**generator_options(), question_bank=question_bank)
+            if parse_bool(os.environ.get('MCQ_WARM_UP'), default=True):
+                generator.warm_up()
             logger.info("MCQ Generator initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing MCQ Generator: {e}")
             logger.error(traceback.format_exc())
-            return jsonify({"error": f"Failed to initialize MCQ Generator: {str(e)}"}), 500
-    
-    # Get parameters from request
-    questions_per_chunk = int(request.form.get('questionsPerChunk', 3))
-    chunk_size = int(request.form.get('chunkSize', 2000))
-    overlap = int(request.form.get('overlap', 200))
-    
+            startup_state.update(status="failed", error=str(e))
+            raise StartupError(f"Failed to initialize MCQ Generator: {str(e)}")
+
+        timings = generator.startup_report()
+        timings["import_seconds"] = round(import_seconds, 3)
+        timings["total_seconds"] = round(time.perf_counter() - started, 3)
+        logger.info(f"MCQ Generator ready in {timings['total_seconds']}s")
+        startup_state.update(status="ready", timings=timings)
+        mcq_generator = generator
+        return mcq_generator
+
+def prepare_generator():
+    """Return the shared MCQ generator, loading it on first use.
+
+    Returns (generator, None) on success or (None, error_response) on failure.
+    """
+    try:
+        return load_generator(), None
+    except StartupError as e:
+        response = {"error": str(e)}
+        if e.missing_models:
+            response["missing_models"] = e.missing_models
+        return None, (jsonify(response), 500)
+
+def start_background_load():
+    """Load the generator on a background thread at startup unless MCQ_EAGER_LOAD is off"""
+    if not parse_bool(os.environ.get('MCQ_EAGER_LOAD'), default=True):
+        return
+
+    def load():
+        try:
+            load_generator()
+        except StartupError as e:
+            logger.error(f"Startup failed: {e}")
+
+    threading.Thread(target=load, name="mcq-startup", daemon=True).start()
+
+def get_generation_options():
+    """Get generation parameters from the request.
+
+    Returns (options, None) on success or (None, error_response) for invalid values.
+    """
+    try:
+        questions_per_chunk = int(request.form.get('questionsPerChunk', 3))
+        chunk_size = int(request.form.get('chunkSize', 512))
+        overlap = int(request.form.get('overlap', 50))
+    except ValueError:
+        return None, (jsonify({"error": "questionsPerChunk, chunkSize and overlap must be integers"}), 400)
+    if questions_per_chunk < 1:
+        return None, (jsonify({"error": "questionsPerChunk must be at least 1"}), 400)
+    if chunk_size < 1:
+        return None, (jsonify({"error": "chunkSize must be a positive number of tokens"}), 400)
+    if not 0 <= overlap < chunk_size:
+        return None, (jsonify({"error": "overlap must be at least 0 and less than chunkSize"}), 400)
+    try:
+        seed = int(request.form['seed']) if request.form.get('seed') else None
+    except ValueError:
+        return None, (jsonify({"error": "seed must be an integer"}), 400)
+    deadline = None
+    if request.form.get('deadline'):
+        try:
+            deadline = float(request.form['deadline'])
+        except ValueError:
+            deadline = math.nan
+        if not math.isfinite(deadline) or deadline <= 0:
+            return None, (jsonify({"error": "deadline must be a positive number of seconds"}), 400)
+        deadline = Deadline(deadline)
+    profile = request.form.get('profile') or None
+    if profile is not None and profile not in PROFILES:
+        return None, (jsonify({"error": f"profile must be one of {', '.join(PROFILES)}"}), 400)
+    keyword_mode = request.form.get('keywordMode') or None
+    if keyword_mode is not None and keyword_mode not in KEYWORD_MODES:
+        return None, (jsonify({"error": f"keywordMode must be one of {', '.join(KEYWORD_MODES)}"}), 400)
+    return {
+        "questions_per_chunk": questions_per_chunk,
+        # chunkSize and overlap are in model tokens; chunks are capped at the 512-token T5 window
+        "chunk_size": chunk_size,
+        "overlap": overlap,
+        # explanations=lazy returns explanation handles for /api/explanations instead of explanations
+        "lazy_explanations": request.form.get('explanations', 'eager').lower() == 'lazy',
+        # keywordMode=fast ranks spaCy candidates by embedding MMR instead of running pke
+        "keyword_mode": keyword_mode,
+        # seed makes the run reproducible: same document, options and seed give the same MCQs
+        "seed": seed,
+        # profile=fast|balanced|quality trades question quality for latency
+        "profile": profile,
+        # deadline is in seconds from now; MCQs of the chunks finished by then are returned
+        "deadline": deadline
+    }, None
+
+def read_document():
+    """Read the uploaded file or text field.
+
+    Returns (UploadedDocument, None) on success or (None, error_response) on failure.
+    """
     # Check if the request has a file or text
     if 'file' in request.files:
         file = request.files['file']
         if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
+            return None, (jsonify({"error": "No file selected"}), 400)
         
-        if file and allowed_file(file.filename):
-            try:
-                # Save file to temporary location
-                filename = secure_filename(file.filename)
-                temp_dir = tempfile.mkdtemp()
-                filepath = os.path.join(temp_dir, filename)
-                file.save(filepath)
-                
-                logger.info(f"Processing file: {filename}")
-                
-                # Process file based on type
-                if filename.endswith('.pdf'):
-                    mcqs = mcq_generator.process_pdf(
-                        filepath, 
-                        questions_per_chunk=questions_per_chunk,
-                        chunk_size=chunk_size,
-                        overlap=overlap
-                    )
-                elif filename.endswith('.txt'):
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        text = f.read()
-                    mcqs = mcq_generator.process_text(
-                        text,
-                        questions_per_chunk=questions_per_chunk,
-                        chunk_size=chunk_size,
-                        overlap=overlap
-                    )
-                
-                # Clean up temporary file
-                os.remove(filepath)
-                os.rmdir(temp_dir)
-                
-                return jsonify({"mcqs": mcqs})
-            
-            except Exception as e:
-                logger.error(f"Error processing file: {e}")
-                logger.error(traceback.format_exc())
-                return jsonify({"error": f"Error processing file: {str(e)}"}), 500
-        else:
-            return jsonify({"error": f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"}), 400
+        if not allowed_file(file.filename):
+            return None, (jsonify({"error": f"File type not allowed. Allowed types: {', '.join(ALLOWED_EXTENSIONS)}"}), 400)
+
+        filename = secure_filename(file.filename)
+        extension = file.filename.rsplit('.', 1)[1].lower()
+        if extension == 'pdf':
+            pages = request.form.get('pages') or None
+            data = file.read()
+            if pages:
+                try:
+                    ranges = parse_page_range(pages)
+                except ValueError as e:
+                    return None, (jsonify({"error": str(e)}), 400)
+                try:
+                    count = page_count(data)
+                except Exception as e:
+                    return None, (jsonify({"error": f"Could not read the PDF: {e}"}), 400)
+                try:
+                    # A range past the end of the document would otherwise only fail during generation
+                    select_pages(ranges, count)
+                except ValueError as e:
+                    return None, (jsonify({"error": str(e)}), 400)
+            # Pages are extracted straight from the uploaded bytes, without a temporary file
+            return UploadedDocument('pdf', data, 'file', f"file: {filename}", pages=pages), None
+
+        try:
+            text = file.read().decode('utf-8')
+        except UnicodeDecodeError:
+            return None, (jsonify({"error": "Text files must be UTF-8 encoded"}), 400)
+        return UploadedDocument('text', text, 'file', f"file: {filename}"), None
     
     elif 'text' in request.form:
         text = request.form['text']
         if not text:
-            return jsonify({"error": "Empty text provided"}), 400
-        
+            return None, (jsonify({"error": "Empty text provided"}), 400)
+        return UploadedDocument('text', text, 'text', "text input"), None
+    
+    else:
+        return None, (jsonify({"error": "No file or text provided"}), 400)
+
+def run_generation(generator, document, options, progress_callback=None, timer=None):
+    """Process a document based on type"""
+    if document.kind == 'pdf':
+        return generator.process_pdf(document.value, progress_callback=progress_callback, timer=timer,
+                                     pages=document.pages, document_key=document.key, **options)
+    return generator.process_text(document.value, progress_callback=progress_callback, timer=timer,
+                                  document_key=document.key, **options)
+
+def iter_generation(generator, document, options, timer=None):
+    """Yield (chunk_index, total_chunks, chunk_mcqs) for a document as each chunk finishes"""
+    if document.kind == 'pdf':
+        return generator.iter_pdf(document.value, timer=timer, pages=document.pages, document_key=document.key,
+                                  **options)
+    return generator.iter_text(document.value, timer=timer, document_key=document.key, **options)
+
+@app.route('/api/generate-mcq', methods=['POST'])
+def generate_mcq():
+    """Generate MCQs from uploaded file or text"""
+    options, error = get_generation_options()
+    if error:
+        return error
+    generator, error = prepare_generator()
+    if error:
+        return error
+    shuffle = parse_bool(request.form.get('shuffle'), default=True)
+    timer = request_timer()
+    document, error = read_document()
+    if error:
+        return error
+
+    try:
+        logger.info(f"Processing {document.description}")
+        started = time.perf_counter()
+        mcqs = run_generation(generator, document, dict(options, shuffle=shuffle), timer=timer)
+        response = {"mcqs": mcqs}
+        if options["deadline"] is not None:
+            response["deadline_reached"] = options["deadline"].reached
+        if question_bank is not None:
+            response["document_id"] = document.key
+        if timer is not None:
+            response["timings"] = timing_breakdown(timer, started)
+        return jsonify(response)
+    except Exception as e:
+        logger.error(f"Error processing {document.source}: {e}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": f"Error processing {document.source}: {str(e)}"}), 500
+    finally:
+        document.close()
+
+@app.route('/api/generate-mcq/stream', methods=['POST'])
+def generate_mcq_stream():
+    """Stream MCQs as NDJSON, one line per finished chunk, so clients can show questions early.
+
+    Questions arrive in chunk order; shuffling is left to the client.
+    """
+    options, error = get_generation_options()
+    if error:
+        return error
+    generator, error = prepare_generator()
+    if error:
+        return error
+    timer = request_timer()
+    document, error = read_document()
+    if error:
+        return error
+
+    def stream():
+        total_mcqs = 0
         try:
-            logger.info("Processing text input")
-            mcqs = mcq_generator.process_text(
-                text,
-                questions_per_chunk=questions_per_chunk,
-                chunk_size=chunk_size,
-                overlap=overlap
-            )
-            return jsonify({"mcqs": mcqs})
-        
+            logger.info(f"Streaming {document.description}")
+            started = time.perf_counter()
+            for chunk_index, total_chunks, chunk_mcqs in iter_generation(generator, document, options, timer=timer):
+                total_mcqs += len(chunk_mcqs)
+                yield json.dumps({
+                    "chunk": chunk_index,
+                    "total_chunks": total_chunks,
+                    "mcqs": chunk_mcqs
+                }) + "\n"
+            done = {"done": True, "total_mcqs": total_mcqs}
+            if options["deadline"] is not None:
+                done["deadline_reached"] = options["deadline"].reached
+            if question_bank is not None:
+                done["document_id"] = document.key
+            if timer is not None:
+                done["timings"] = timing_breakdown(timer, started)
+            yield json.dumps(done) + "\n"
         except Exception as e:
-            logger.error(f"Error processing text: {e}")
+            logger.error(f"Error processing {document.source}: {e}")
             logger.error(traceback.format_exc())
-            return jsonify({"error": f"Error processing text: {str(e)}"}), 500
-    
-    else:
-        return jsonify({"error": "No file or text provided"}), 400
+            yield json.dumps({"error": f"Error processing {document.source}: {str(e)}"}) + "\n"
+        finally:
+            document.close()
+
+    # Ask reverse proxies not to buffer the stream
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no'})
+
+@app.route('/api/explanations', methods=['POST'])
+def explanations():
+    """Generate or fetch explanations for the explanation handles of lazily explained MCQs"""
+    data = request.get_json(silent=True) or {}
+    handles = data.get('handles')
+    if handles is None and 'summary_id' in data:
+        handles = [data]
+    if not isinstance(handles, list) or not handles:
+        return jsonify({"error": "Provide a list of explanation handles in 'handles'"}), 400
+    if len(handles) > MAX_EXPLANATION_HANDLES:
+        return jsonify({"error": f"At most {MAX_EXPLANATION_HANDLES} handles per request"}), 400
+
+    generator, error = prepare_generator()
+    if error:
+        return error
+
+    try:
+        return jsonify({"explanations": generator.explain(handles)})
+    except Exception as e:
+        logger.error(f"Error generating explanations: {e}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": f"Error generating explanations: {str(e)}"}), 500
+
+def sample_options():
+    """count, topic and user_id of a question sample request, from the form or query string"""
+    values = request.values
+    count = min(max(int(values.get('count', 10)), 1), MAX_SAMPLE_COUNT)
+    return count, (values.get('topic') or '').strip() or None, values.get('user_id') or None
+
+def topic_embedding(topic):
+    """Embedding of the topic if the generator is loaded; without it topics match by text only"""
+    if not topic or mcq_generator is None:
+        return None
+    return mcq_generator.embeddings.encode([topic])[0]
+
+@app.route('/api/questions/sample', methods=['POST'])
+def sample_questions():
+    """Serve count MCQs for a document from the question bank, generating it only if the bank falls short.
+
+    Takes the same form as /api/generate-mcq plus count, topic and user_id.
+    """
+    if question_bank is None:
+        return jsonify({"error": "The question bank is disabled"}), 404
+    try:
+        count, topic, user_id = sample_options()
+    except ValueError:
+        return jsonify({"error": "count must be a number"}), 400
+    options, error = get_generation_options()
+    if error:
+        return error
+    document, error = read_document()
+    if error:
+        return error
+
+    try:
+        source = "bank"
+        mcqs = question_bank.sample(document.key, count, topic, topic_embedding(topic), user_id)
+        banked = question_bank.document(document.key)
+        if len(mcqs) < count and not (banked and banked["complete"]):
+            generator, error = prepare_generator()
+            if error:
+                return error
+            logger.info(f"Question bank has too few questions, generating {document.description}")
+            run_generation(generator, document, dict(options, shuffle=False))
+            source = "generated"
+            mcqs += question_bank.sample(document.key, count - len(mcqs), topic, topic_embedding(topic), user_id,
+                                         exclude=[mcq["question_id"] for mcq in mcqs])
+        random.shuffle(mcqs)
+        return jsonify({"document_id": document.key, "source": source, "mcqs": mcqs})
+    except Exception as e:
+        logger.error(f"Error sampling questions for {document.source}: {e}")
+        logger.error(traceback.format_exc())
+        return jsonify({"error": f"Error sampling questions for {document.source}: {str(e)}"}), 500
+    finally:
+        document.close()
+
+@app.route('/api/documents/<document_id>/questions', methods=['GET'])
+def document_questions(document_id):
+    """Sample MCQs of a banked document by its document_id, never generating"""
+    if question_bank is None:
+        return jsonify({"error": "The question bank is disabled"}), 404
+    banked = question_bank.document(document_id)
+    if banked is None:
+        return jsonify({"error": "Unknown document"}), 404
+    try:
+        count, topic, user_id = sample_options()
+    except ValueError:
+        return jsonify({"error": "count must be a number"}), 400
+    mcqs = question_bank.sample(document_id, count, topic, topic_embedding(topic), user_id)
+    return jsonify({"document_id": document_id, "mcqs": mcqs, **banked})
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """Queue MCQ generation in the background and return a job id right away"""
+    options, error = get_generation_options()
+    if error:
+        return error
+    generator, error = prepare_generator()
+    if error:
+        return error
+    document, error = read_document()
+    if error:
+        return error
+
+    logger.info(f"Queueing job for {document.description}")
+    try:
+        job = job_manager.submit(
+            lambda progress_callback: run_generation(generator, document, options, progress_callback),
+            cleanup=document.close
+        )
+    except QueueFullError as e:
+        document.close()
+        return jsonify({"error": str(e)}), 429
+
+    return jsonify({
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}",
+        "mcqs_url": f"/api/jobs/{job.id}/mcqs"
+    }), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Report chunks done, MCQs so far and ETA of a job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/mcqs', methods=['GET'])
+def job_mcqs(job_id):
+    """Return the MCQs of a job generated so far, starting at ?offset= for incremental polling"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    # Read the status first so a completed job is guaranteed to return all of its MCQs
+    response = job.to_dict()
+    mcqs = job.mcqs_from(offset)
+    response["mcqs"] = mcqs
+    response["next_offset"] = offset + len(mcqs)
+    return jsonify(response)
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Readiness probe: 200 once the models are loaded and warmed up, 503 until then"""
+    response = dict(startup_state)
+    return jsonify(response), (200 if mcq_generator is not None else 503)
 
 @app.route('/api/download-models', methods=['POST'])
 def download_models():
@@ -228,16 +663,63 @@ def download_models():
         logger.error(traceback.format_exc())
         return jsonify({"error": f"Error downloading models: {str(e)}"}), 500
 
+def generator_metrics():
+    """Cache, scheduler and memory metrics of the loaded generator, read at scrape time"""
+    if mcq_generator is None:
+        return []
+    caches = mcq_generator.cache_stats()
+    embeddings = caches["embeddings"]
+    collected = [
+        ("mcq_embedding_cache_hits_total", "counter", "Embedding cache hits", [({}, embeddings["hits"])]),
+        ("mcq_embedding_cache_misses_total", "counter", "Embedding cache misses", [({}, embeddings["misses"])]),
+        ("mcq_embedding_cache_bytes", "gauge", "Bytes held by the embedding cache", [({}, embeddings["bytes"])]),
+        ("mcq_model_memory_megabytes", "gauge", "Resident model weight memory", [({}, mcq_generator.memory_report()["total_mb"])])
+    ]
+    results = caches["results"]
+    if results is not None:
+        collected += [
+            ("mcq_result_cache_hits_total", "counter", "Result cache hits", [({}, results["hits"])]),
+            ("mcq_result_cache_misses_total", "counter", "Result cache misses", [({}, results["misses"])]),
+            ("mcq_result_cache_entries", "gauge", "Chunks stored in the result cache", [({}, results["entries"])]),
+            ("mcq_result_cache_bytes", "gauge", "Bytes stored in the result cache", [({}, results["bytes"])])
+        ]
+    bank = caches["question_bank"]
+    if bank is not None:
+        collected += [
+            ("mcq_question_bank_documents", "gauge", "Documents with questions in the bank", [({}, bank["documents"])]),
+            ("mcq_question_bank_questions", "gauge", "Questions stored in the bank", [({}, bank["questions"])])
+        ]
+    if mcq_generator.scheduler is not None:
+        scheduler = mcq_generator.scheduler.stats()
+        collected += [
+            ("mcq_scheduler_queue_depth", "gauge", "Generation requests waiting for a batch", [({}, scheduler["queue_depth"])]),
+            ("mcq_scheduler_batches_total", "counter", "Generation batches run by the scheduler", [({}, scheduler["batches_total"])]),
+            ("mcq_scheduler_prompts_total", "counter", "Prompts generated by the scheduler", [({}, scheduler["prompts_total"])])
+        ]
+    return collected
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics():
+    """Prometheus text-format counters and histograms for the pipeline and the API"""
+    return Response(REGISTRY.render(collected=generator_metrics()), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/models-status', methods=['GET'])
 def models_status():
     """Check the status of required models"""
     models_exist, missing_models = check_models_exist()
     
     if models_exist:
-        return jsonify({
+        response = {
             "status": "ok",
             "message": "All required models are available"
-        })
+        }
+        # Resident weight memory and cache statistics are only known once the generator has loaded
+        if mcq_generator is not None:
+            response["memory"] = mcq_generator.memory_report()
+            response["caches"] = mcq_generator.cache_stats()
+            if mcq_generator.scheduler is not None:
+                response["scheduler"] = mcq_generator.scheduler.stats()
+        return jsonify(response)
     else:
         return jsonify({
             "status": "missing",
@@ -246,5 +728,11 @@ def models_status():
         })
 
 if __name__ == '__main__':
+    # The debug reloader runs this file twice; only the child that serves requests loads the models
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_load()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
+else:
+    # Imported by a WSGI server
+    start_background_load()
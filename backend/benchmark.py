@@ -0,0 +1,304 @@
+"""Offline benchmark of the MCQ pipeline over a fixed corpus.
+
+Runs every .txt and .pdf fixture in benchmarks/corpus with a fixed seed and reports
+per-stage wall time (summary, keywords, questions, distractors, explanations),
+throughput and peak RSS as JSON, so runs can be compared across commits. Run from
+the backend directory:
+
+    python benchmark.py --output bench.json
+    python benchmark.py --output bench.json --compare previous.json
+
+--tiny builds small randomly initialized T5, encoder and Sense2Vec models from the
+corpus vocabulary in a temporary directory, so the pipeline can be exercised
+without the real checkpoints (the spaCy en_core_web_sm package and NLTK data are
+still required). Tiny-model timings are only comparable with other tiny runs.
+"""
+import os
+import re
+import sys
+import glob
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import numpy as np
+import torch
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "corpus")
+STAGES = ("summary", "keywords", "questions", "distractors", "explanations")
+
+
+def load_fixtures(corpus_dir):
+    return sorted(glob.glob(os.path.join(corpus_dir, "*.txt")) + glob.glob(os.path.join(corpus_dir, "*.pdf")))
+
+
+def seed_everything(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of finished child processes"""
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if platform.system() == "Darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return round(own / (1024 * 1024), 1), round(children / (1024 * 1024), 1)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def corpus_text(fixtures):
+    from pdf_extract import extract_text_from_pdf
+
+    texts = []
+    for path in fixtures:
+        if path.endswith(".pdf"):
+            texts.append(extract_text_from_pdf(path))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                texts.append(f.read())
+    return "\n".join(texts)
+
+
+def build_tiny_models(models_dir, text, seed=0):
+    """Write small randomly initialized stand-ins for every model into models_dir"""
+    import sentencepiece as spm
+    from transformers import T5Config, T5ForConditionalGeneration, T5Tokenizer, BertConfig, BertModel, BertTokenizer
+    from sentence_transformers import SentenceTransformer, models as st_models
+    from sense2vec import Sense2Vec
+
+    torch.manual_seed(seed)
+    rng = np.random.default_rng(seed)
+    work_dir = os.path.join(models_dir, "_build")
+    os.makedirs(work_dir, exist_ok=True)
+    lines = [line for line in text.splitlines() if line.strip()]
+
+    # T5: a sentencepiece vocabulary trained on the corpus and a 2-layer model
+    spm.SentencePieceTrainer.train(
+        sentence_iterator=iter(lines),
+        model_prefix=os.path.join(work_dir, "spiece"),
+        vocab_size=500,
+        hard_vocab_limit=False,
+        model_type="unigram",
+        pad_id=0, eos_id=1, unk_id=2, bos_id=-1
+    )
+    tokenizer = T5Tokenizer(os.path.join(work_dir, "spiece.model"), extra_ids=0)
+    config = T5Config(
+        vocab_size=len(tokenizer), d_model=64, d_kv=16, d_ff=128, num_layers=2,
+        num_decoder_layers=2, num_heads=4, decoder_start_token_id=0, pad_token_id=0, eos_token_id=1
+    )
+    for name in ("t5-base", "t5_squad_v1"):
+        path = os.path.join(models_dir, name)
+        T5ForConditionalGeneration(config).save_pretrained(path)
+        tokenizer.save_pretrained(path)
+
+    # Sentence encoder: a 2-layer BERT over the corpus words with mean pooling
+    words = sorted({w.lower() for w in re.findall(r"\w+|[^\w\s]", text)})
+    bert_dir = os.path.join(work_dir, "bert")
+    os.makedirs(bert_dir, exist_ok=True)
+    with open(os.path.join(bert_dir, "vocab.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words) + "\n")
+    bert_tokenizer = BertTokenizer(os.path.join(bert_dir, "vocab.txt"))
+    bert_config = BertConfig(
+        vocab_size=len(bert_tokenizer), hidden_size=64, num_hidden_layers=2,
+        num_attention_heads=4, intermediate_size=128, max_position_embeddings=512
+    )
+    BertModel(bert_config).save_pretrained(bert_dir)
+    bert_tokenizer.save_pretrained(bert_dir)
+    word_embedding = st_models.Transformer(bert_dir, max_seq_length=256)
+    pooling = st_models.Pooling(word_embedding.get_word_embedding_dimension())
+    SentenceTransformer(modules=[word_embedding, pooling]).save(os.path.join(models_dir, "msmarco-distilbert-base-v3"))
+
+    # Sense2Vec: random vectors for the corpus words as nouns
+    senses = ["NOUN"]
+    keys = [f"{w}|NOUN" for w in words if w.isalpha() and len(w) > 3]
+    s2v = Sense2Vec(shape=(len(keys), 32), senses=senses)
+    for key in keys:
+        s2v.add(key, rng.standard_normal(32).astype(np.float32), freq=int(rng.integers(1, 1000)))
+    s2v.to_disk(os.path.join(models_dir, "s2v_old"))
+
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_fixture(generator, path, questions_per_chunk, seed):
+    progress = {"chunks": 0}
+
+    def on_progress(done, total, chunk_mcqs, pages=None):
+        progress["chunks"] = total
+
+    seed_everything(seed)
+    generator.timer.reset()
+    start = time.perf_counter()
+    if path.endswith(".pdf"):
+        mcqs = generator.process_pdf(path, questions_per_chunk=questions_per_chunk,
+                                     progress_callback=on_progress, shuffle=False, seed=seed)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        mcqs = generator.process_text(text, questions_per_chunk=questions_per_chunk,
+                                      progress_callback=on_progress, shuffle=False, seed=seed)
+    seconds = time.perf_counter() - start
+
+    return {
+        "fixture": os.path.basename(path),
+        "seconds": round(seconds, 3),
+        "chunks": progress["chunks"],
+        "mcqs": len(mcqs),
+        "stages": generator.timer.snapshot()
+    }
+
+
+def summarize(fixtures):
+    seconds = sum(f["seconds"] for f in fixtures)
+    chunks = sum(f["chunks"] for f in fixtures)
+    mcqs = sum(f["mcqs"] for f in fixtures)
+    stages = {}
+    for fixture in fixtures:
+        for stage, row in fixture["stages"].items():
+            total = stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+            total["seconds"] += row["seconds"]
+            total["calls"] += row["calls"]
+    for stage, row in stages.items():
+        row["seconds"] = round(row["seconds"], 3)
+        row["share"] = round(row["seconds"] / seconds, 3) if seconds else 0.0
+    minutes = seconds / 60 if seconds else 0
+    return {
+        "seconds": round(seconds, 3),
+        "chunks": chunks,
+        "mcqs": mcqs,
+        "chunks_per_minute": round(chunks / minutes, 2) if minutes else None,
+        "mcqs_per_minute": round(mcqs / minutes, 2) if minutes else None,
+        "stages": stages
+    }
+
+
+def print_report(report, baseline=None):
+    totals = report["totals"]
+    print(f"\nLoad: {report['load_seconds']:.2f}s   Total: {totals['seconds']:.2f}s   "
+          f"{totals['chunks_per_minute']} chunks/min   {totals['mcqs_per_minute']} MCQs/min   "
+          f"peak RSS {report['peak_rss_mb']} MB")
+    base_stages = baseline["totals"]["stages"] if baseline else {}
+    for stage in list(STAGES) + sorted(set(totals["stages"]) - set(STAGES)):
+        row = totals["stages"].get(stage)
+        if row is None:
+            continue
+        line = f"  {stage:<13} {row['seconds']:>9.3f}s  {row['share'] * 100:5.1f}%  ({row['calls']} calls)"
+        if stage in base_stages and base_stages[stage]["seconds"]:
+            change = (row["seconds"] - base_stages[stage]["seconds"]) / base_stages[stage]["seconds"] * 100
+            line += f"  {change:+.1f}% vs baseline"
+        print(line)
+    if baseline:
+        base = baseline["totals"]["seconds"]
+        if base:
+            print(f"  {'total':<13} {(totals['seconds'] - base) / base * 100:+.1f}% vs baseline "
+                  f"({baseline.get('commit') or baseline.get('label')})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the MCQ pipeline on a fixed corpus")
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="Directory of .txt and .pdf fixtures")
+    parser.add_argument("--models-dir", default="models", help="Directory with the local models")
+    parser.add_argument("--tiny", action="store_true", help="Use small randomly initialized models")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--questions-per-chunk", type=int, default=3)
+    parser.add_argument("--quantize", choices=["int8"], help="Quantize models as in MCQ_QUANTIZE")
+    parser.add_argument("--threads", type=int, default=0, help="Torch intra-op threads (0 = torch default)")
+    parser.add_argument("--keyword-mode", choices=["quality", "fast"], default="quality",
+                        help="Keyword extractor: pke MultipartiteRank (quality) or embedding MMR (fast)")
+    parser.add_argument("--profile", choices=["fast", "balanced", "quality"], default="quality",
+                        help="Speed/quality profile as in MCQ_PROFILE")
+    parser.add_argument("--label", help="Free-form label stored in the report")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    parser.add_argument("--compare", help="Earlier JSON report to compare stage timings against")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures(args.corpus)
+    if not fixtures:
+        print(f"No fixtures found in {args.corpus}")
+        return 1
+
+    from mcq_generator import MCQGenerator
+
+    models_dir = args.models_dir
+    tiny_dir = None
+    if args.tiny:
+        tiny_dir = tempfile.mkdtemp(prefix="mcq-tiny-models-")
+        print(f"Building tiny models in {tiny_dir}...")
+        build_tiny_models(tiny_dir, corpus_text(fixtures), seed=args.seed)
+        models_dir = tiny_dir
+
+    try:
+        seed_everything(args.seed)
+        start = time.perf_counter()
+        generator = MCQGenerator(
+            use_gpu=False,
+            models_dir=models_dir,
+            offline=True,
+            quantize=args.quantize,
+            intra_op_threads=args.threads or None,
+            keyword_mode=args.keyword_mode,
+            profile=args.profile
+        )
+        load_seconds = time.perf_counter() - start
+
+        results = []
+        for path in fixtures:
+            print(f"\nBenchmarking {os.path.basename(path)}...")
+            results.append(run_fixture(generator, path, args.questions_per_chunk, args.seed))
+        generator.close()
+    finally:
+        if tiny_dir:
+            shutil.rmtree(tiny_dir, ignore_errors=True)
+
+    own_rss, children_rss = peak_rss_mb()
+    report = {
+        "label": args.label,
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "tiny": args.tiny,
+            "models_dir": None if args.tiny else os.path.abspath(models_dir),
+            "seed": args.seed,
+            "questions_per_chunk": args.questions_per_chunk,
+            "quantize": args.quantize,
+            "keyword_mode": args.keyword_mode,
+            "profile": args.profile,
+            "threads": torch.get_num_threads(),
+            "python": platform.python_version(),
+            "torch": torch.__version__
+        },
+        "load_seconds": round(load_seconds, 3),
+        "fixtures": results,
+        "totals": summarize(results),
+        "peak_rss_mb": own_rss,
+        "peak_rss_children_mb": children_rss
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
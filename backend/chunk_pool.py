@@ -0,0 +1,160 @@
+import os
+import random
+import threading
+import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+from collections import deque
+from concurrent.futures.process import BrokenProcessPool
+import torch
+
+# Set in the parent right before the workers fork, so they inherit the loaded
+# models copy-on-write instead of loading or pickling them
+_worker_generator = None
+
+# Chunks submitted per worker ahead of the oldest one still being generated
+LOOKAHEAD_PER_WORKER = 2
+
+
+def fork_available():
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def _init_worker(threads):
+    # Keep workers x threads within the machine's cores
+    torch.set_num_threads(threads)
+    # A pool rebuilt after a worker died forks after the scheduler thread started, and that
+    # thread does not survive the fork, so workers call the models directly
+    _worker_generator.scheduler = None
+    # Forked workers would otherwise all continue from the parent's random state
+    random.seed()
+
+
+def _ping():
+    return True
+
+
+def _run_chunk(chunk, num_questions, lazy_explanations=False, keyword_mode=None, dedup=None, seed=None,
+               chunk_index=0, profile=None, deadline=None):
+    try:
+        return _worker_generator.process_chunk_result(chunk, num_questions=num_questions,
+                                                      lazy_explanations=lazy_explanations,
+                                                      keyword_mode=keyword_mode, dedup=dedup,
+                                                      seed=seed, chunk_index=chunk_index,
+                                                      profile=profile, deadline=deadline), None
+    except Exception as e:
+        return None, f"{e}\n{traceback.format_exc()}"
+
+
+class ChunkWorkerPool:
+    """Process pool of forked workers that run MCQGenerator.process_chunk on the parent's models"""
+    def __init__(self, generator, workers, threads_per_worker=None):
+        self.generator = generator
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        self._executor = None
+        # Concurrent requests must not fork two pools
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        global _worker_generator
+        with self._lock:
+            if self._executor is None:
+                _worker_generator = self.generator
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("fork"),
+                    initializer=_init_worker,
+                    initargs=(self.threads_per_worker,)
+                )
+            return self._executor
+
+    def start(self):
+        """Fork the workers now rather than on the first chunk, e.g. before other threads start"""
+        self._get_executor().submit(_ping).result()
+
+    def imap(self, chunks, num_questions, lazy_explanations=False, keyword_mode=None, dedup=None, seed=None,
+             profile=None, deadline=None):
+        """Yield (chunk_index, chunk_result) in chunk order while the workers run ahead.
+
+        chunks may be any iterable, read only as far as LOOKAHEAD_PER_WORKER chunks per
+        worker ahead of the oldest unfinished one; None entries are not generated and
+        yield (index, None). chunk_result is the dict from
+        MCQGenerator.process_chunk_result, including the telemetry the worker collected,
+        or None if the chunk raised. If a worker dies, the chunk is retried in this
+        process and the pool is rebuilt. Each chunk gets a copy of dedup as it is at
+        submission, so chunks running side by side may still repeat each other. seed is
+        passed on with each chunk's index, and profile and deadline as is. Once the
+        Deadline passes, unfinished chunks are cancelled or abandoned, deadline.reached
+        is set and the iteration ends.
+        """
+        window = deque()
+        in_flight = 0
+        for i, chunk in enumerate(chunks):
+            future = chunk_dedup = None
+            if chunk is not None:
+                chunk_dedup = dedup.copy() if dedup is not None else None
+                future = self._get_executor().submit(_run_chunk, chunk, num_questions, lazy_explanations, keyword_mode,
+                                                     chunk_dedup, seed, i, profile, deadline)
+                in_flight += 1
+            window.append((i, chunk, future, chunk_dedup))
+            # Hand back finished chunks right away; block only when the window is full
+            while window and (window[0][2] is None or window[0][2].done()
+                              or in_flight >= self.workers * LOOKAHEAD_PER_WORKER):
+                if not self._ready(window[0][2], deadline):
+                    self._abandon(window, deadline)
+                    return
+                if window[0][2] is not None:
+                    in_flight -= 1
+                yield self._result(*window.popleft(), num_questions, lazy_explanations, keyword_mode, seed, profile,
+                                   deadline)
+        while window:
+            if not self._ready(window[0][2], deadline):
+                self._abandon(window, deadline)
+                return
+            yield self._result(*window.popleft(), num_questions, lazy_explanations, keyword_mode, seed, profile,
+                               deadline)
+
+    @staticmethod
+    def _ready(future, deadline):
+        """Wait for a chunk until the deadline; False if the deadline passed first"""
+        if future is None or deadline is None:
+            return True
+        wait([future], timeout=deadline.remaining())
+        return future.done()
+
+    @staticmethod
+    def _abandon(window, deadline):
+        # Queued chunks are cancelled; running ones finish in their worker and are dropped
+        for _, _, future, _ in window:
+            if future is not None:
+                future.cancel()
+        deadline.reached = True
+        print(f"Deadline reached, dropping {len(window)} unfinished chunks")
+
+    def _result(self, i, chunk, future, dedup, num_questions, lazy_explanations, keyword_mode, seed=None,
+                profile=None, deadline=None):
+        if future is None:
+            return i, None
+        try:
+            result, error = future.result()
+        except BrokenProcessPool:
+            print(f"Chunk worker pool broke, processing chunk {i+1} in the main process")
+            self.shutdown()
+            try:
+                result, error = self.generator.process_chunk_result(
+                    chunk, num_questions=num_questions, lazy_explanations=lazy_explanations,
+                    keyword_mode=keyword_mode, dedup=dedup, seed=seed, chunk_index=i, profile=profile,
+                    deadline=deadline
+                ), None
+            except Exception as e:
+                result, error = None, str(e)
+        if error:
+            print(f"Error processing chunk {i+1}: {error}")
+        return i, result
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
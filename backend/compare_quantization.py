@@ -0,0 +1,187 @@
+"""Compare fp32 and dynamic int8 CPU inference on the fixed benchmark corpus.
+
+Both generators see the same chunks and the same random draws, so differences in
+their outputs come from quantization alone. Output similarity is measured with the
+fp32 sentence encoder. Run from the backend directory:
+
+    python compare_quantization.py --output quantization_report.json
+"""
+import os
+import sys
+import glob
+import json
+import time
+import random
+import argparse
+import numpy as np
+import torch
+from mcq_generator import MCQGenerator
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks", "corpus")
+
+
+def load_corpus(corpus_dir):
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, "*.txt"))):
+        with open(path, "r", encoding="utf-8") as f:
+            corpus.append((os.path.basename(path), f.read()))
+    return corpus
+
+
+def seed_everything(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def jaccard(a, b):
+    a = {x.lower() for x in a}
+    b = {x.lower() for x in b}
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+class Comparison:
+    def __init__(self, reference, candidate, seed, questions_per_chunk):
+        self.reference = reference
+        self.candidate = candidate
+        self.seed = seed
+        self.questions_per_chunk = questions_per_chunk
+        self.latency = {"reference": {}, "candidate": {}}
+        self.similarity = {}
+
+    def _time(self, stage, side, seconds):
+        self.latency[side][stage] = self.latency[side].get(stage, 0.0) + seconds
+
+    def _similar(self, metric, value):
+        self.similarity.setdefault(metric, []).append(float(value))
+
+    def _text_similarity(self, a, b):
+        embeddings = self.reference.embeddings.encode([a, b])
+        return np.dot(embeddings[0], embeddings[1]) / (
+            np.linalg.norm(embeddings[0]) * np.linalg.norm(embeddings[1])
+        )
+
+    def _run_stage(self, stage, fn_name, *args, seed=True, candidate_args=None):
+        outputs = {}
+        for side, generator, stage_args in (("reference", self.reference, args),
+                                            ("candidate", self.candidate, candidate_args or args)):
+            if seed:
+                seed_everything(self.seed)
+            outputs[side], seconds = timed(getattr(generator, fn_name), *stage_args)
+            self._time(stage, side, seconds)
+        return outputs["reference"], outputs["candidate"]
+
+    def compare_chunk(self, chunk):
+        chunk = chunk.strip().replace("\n", " ")
+
+        ref_summary, cand_summary = self._run_stage("summary", "generate_summary", chunk)
+        self._similar("summary", self._text_similarity(ref_summary, cand_summary))
+
+        # Later stages all start from the reference summary so only the stage itself differs
+        ref_analysis, cand_analysis = self._run_stage("keywords", "analyze_text", ref_summary, seed=False)
+        self._similar("keywords_jaccard", jaccard(ref_analysis.keywords[:10], cand_analysis.keywords[:10]))
+
+        keywords = ref_analysis.keywords[:self.questions_per_chunk]
+        if not keywords:
+            return
+        ref_questions, cand_questions = self._run_stage(
+            "questions", "generate_questions", ref_summary, keywords, ref_analysis,
+            candidate_args=(ref_summary, keywords, cand_analysis)
+        )
+        for ref_question, cand_question in zip(ref_questions, cand_questions):
+            self._similar("question", self._text_similarity(ref_question, cand_question))
+
+        pairs = list(zip(keywords, ref_questions))
+        ref_explanations, cand_explanations = self._run_stage("explanations", "generate_explanations", ref_summary, pairs)
+        for ref_explanation, cand_explanation in zip(ref_explanations, cand_explanations):
+            self._similar("explanation", self._text_similarity(ref_explanation, cand_explanation))
+
+    def report(self):
+        stages = sorted(self.latency["reference"])
+        latency = {}
+        for stage in stages:
+            ref = self.latency["reference"][stage]
+            cand = self.latency["candidate"].get(stage, 0.0)
+            latency[stage] = {
+                "fp32_seconds": round(ref, 3),
+                "int8_seconds": round(cand, 3),
+                "speedup": round(ref / cand, 2) if cand else None
+            }
+        similarity = {
+            metric: {"mean": round(float(np.mean(values)), 4), "min": round(float(np.min(values)), 4), "n": len(values)}
+            for metric, values in self.similarity.items()
+        }
+        return {"latency": latency, "similarity": similarity}
+
+
+def end_to_end(generator, corpus, seed, questions_per_chunk):
+    results = {}
+    for name, text in corpus:
+        seed_everything(seed)
+        mcqs, seconds = timed(generator.process_text, text, questions_per_chunk=questions_per_chunk)
+        results[name] = {"seconds": round(seconds, 3), "mcqs": len(mcqs)}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare fp32 and int8 quantized inference quality and latency")
+    parser.add_argument("--corpus", default=CORPUS_DIR, help="Directory of .txt fixtures")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--questions-per-chunk", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=0, help="Torch intra-op threads (0 = torch default)")
+    parser.add_argument("--skip-end-to-end", action="store_true", help="Only run the per-stage comparison")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print(f"No .txt fixtures found in {args.corpus}")
+        return 1
+
+    options = {"use_gpu": False, "embedding_cache_mb": 0, "intra_op_threads": args.threads or None}
+    reference = MCQGenerator(quantize=None, **options)
+    candidate = MCQGenerator(quantize="int8", **options)
+
+    comparison = Comparison(reference, candidate, args.seed, args.questions_per_chunk)
+    for name, text in corpus:
+        for chunk in reference.chunk_text(text):
+            print(f"Comparing {name}...")
+            comparison.compare_chunk(chunk)
+
+    report = comparison.report()
+    report["corpus"] = [name for name, _ in corpus]
+    report["seed"] = args.seed
+    report["threads"] = torch.get_num_threads()
+    report["memory_mb"] = {
+        "fp32": reference.memory_report()["total_mb"],
+        "int8": candidate.memory_report()["total_mb"]
+    }
+    if not args.skip_end_to_end:
+        report["end_to_end"] = {
+            "fp32": end_to_end(reference, corpus, args.seed, args.questions_per_chunk),
+            "int8": end_to_end(candidate, corpus, args.seed, args.questions_per_chunk)
+        }
+
+    print("\nStage latency (fp32 -> int8):")
+    for stage, row in report["latency"].items():
+        print(f"  {stage:<13} {row['fp32_seconds']:>8.2f}s -> {row['int8_seconds']:>8.2f}s  x{row['speedup']}")
+    print("Output similarity to fp32 (cosine, keywords as Jaccard):")
+    for metric, row in report["similarity"].items():
+        print(f"  {metric:<17} mean {row['mean']:.3f}  min {row['min']:.3f}  (n={row['n']})")
+    print(f"Model memory: {report['memory_mb']['fp32']} MB -> {report['memory_mb']['int8']} MB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
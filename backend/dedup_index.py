@@ -0,0 +1,63 @@
+import re
+import numpy as np
+
+_ARTICLES = re.compile(r"^(the|a|an)\s+")
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def normalize_answer(text):
+    """Lowercase, drop punctuation and a leading article, collapse whitespace"""
+    text = _NON_WORD.sub(" ", text.lower())
+    text = " ".join(text.split())
+    return _ARTICLES.sub("", text)
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class DedupIndex:
+    """Answers and questions already used in a document, to skip near-duplicates in later chunks.
+
+    An answer is a duplicate if its normalized text was used before or its embedding
+    is within threshold cosine similarity of a used answer; a question is a duplicate
+    if its embedding is that close to a used question. Plain numpy and sets, so it
+    pickles cheaply into chunk workers.
+    """
+    def __init__(self, threshold=0.9):
+        self.threshold = threshold
+        self.answers = set()
+        self._answer_vectors = []
+        self._question_vectors = []
+
+    def __len__(self):
+        return len(self.answers)
+
+    def copy(self):
+        index = DedupIndex(self.threshold)
+        index.answers = set(self.answers)
+        index._answer_vectors = list(self._answer_vectors)
+        index._question_vectors = list(self._question_vectors)
+        return index
+
+    @staticmethod
+    def _closest(vectors, embedding):
+        if not vectors or embedding is None:
+            return -1.0
+        return float(np.max(np.stack(vectors) @ _unit(embedding)))
+
+    def is_duplicate_answer(self, answer, embedding=None):
+        if normalize_answer(answer) in self.answers:
+            return True
+        return self._closest(self._answer_vectors, embedding) >= self.threshold
+
+    def is_duplicate_question(self, embedding):
+        return self._closest(self._question_vectors, embedding) >= self.threshold
+
+    def add(self, answer, answer_embedding=None, question_embedding=None):
+        self.answers.add(normalize_answer(answer))
+        if answer_embedding is not None:
+            self._answer_vectors.append(_unit(answer_embedding))
+        if question_embedding is not None:
+            self._question_vectors.append(_unit(question_embedding))
@@ -0,0 +1,138 @@
+import os
+import re
+import sys
+import json
+import atexit
+import threading
+from collections import OrderedDict
+import numpy as np
+from timing import span
+
+
+def normalize_key(text):
+    """Collapse whitespace so trivially different strings share one cache entry"""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class EmbeddingCache:
+    """Bounded LRU cache of sentence embeddings in front of SentenceTransformer.encode"""
+    def __init__(self, model, max_bytes=64 * 1024 * 1024, persist_path=None):
+        self.model = model
+        self.max_bytes = max_bytes
+        self.persist_path = persist_path
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if persist_path:
+            self.load(persist_path)
+            atexit.register(self.save, persist_path)
+
+    def _entry_bytes(self, key, embedding):
+        return embedding.nbytes + sys.getsizeof(key)
+
+    def _put(self, key, embedding):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+        size = self._entry_bytes(key, embedding)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = embedding
+        self._bytes += size
+
+        # Evict least recently used entries until we are back under budget
+        while self._bytes > self.max_bytes:
+            old_key, old_embedding = self._entries.popitem(last=False)
+            self._bytes -= self._entry_bytes(old_key, old_embedding)
+            self.evictions += 1
+
+    def encode(self, sentences, **kwargs):
+        """Drop-in replacement for model.encode that only encodes strings not already cached"""
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        if len(sentences) == 0:
+            return self.model.encode(sentences, **kwargs)
+
+        keys = [normalize_key(s) for s in sentences]
+        results = [None] * len(keys)
+        missing = OrderedDict()
+        with self._lock:
+            for i, key in enumerate(keys):
+                embedding = self._entries.get(key)
+                if embedding is not None:
+                    self._entries.move_to_end(key)
+                    results[i] = embedding
+                    self.hits += 1
+                else:
+                    missing.setdefault(key, []).append(i)
+                    self.misses += 1
+
+        if missing:
+            texts = list(missing)
+            with span("model.embedding"):
+                embeddings = np.asarray(self.model.encode(texts, **kwargs), dtype=np.float32)
+            with self._lock:
+                for text, embedding in zip(texts, embeddings):
+                    # Copy so cached rows don't keep the whole batch array alive
+                    embedding = embedding.copy()
+                    self._put(text, embedding)
+                    for i in missing[text]:
+                        results[i] = embedding
+
+        return results[0] if single else np.stack(results)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def save(self, path=None):
+        """Write the cache as <path>.npy (embedding matrix) and <path>.json (keys)"""
+        path = path or self.persist_path
+        with self._lock:
+            if not path or not self._entries:
+                return
+            keys = list(self._entries)
+            matrix = np.stack([self._entries[key] for key in keys])
+
+        # Write to temporary files and swap them in, so a mapped previous file stays valid
+        np.save(path + ".tmp.npy", matrix)
+        with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+            json.dump(keys, f)
+        os.replace(path + ".tmp.npy", path + ".npy")
+        os.replace(path + ".json.tmp", path + ".json")
+
+    def load(self, path):
+        """Load a saved cache, memory-mapping the embedding matrix instead of reading it into RAM"""
+        if not (os.path.exists(path + ".npy") and os.path.exists(path + ".json")):
+            return
+        try:
+            matrix = np.load(path + ".npy", mmap_mode="r")
+            with open(path + ".json", "r", encoding="utf-8") as f:
+                keys = json.load(f)
+        except Exception as e:
+            print(f"Could not load embedding cache from {path}: {e}")
+            return
+
+        with self._lock:
+            for key, embedding in zip(keys, matrix):
+                self._put(key, embedding)
+        print(f"Loaded {len(self._entries)} cached embeddings from {path}")
@@ -0,0 +1,117 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+def summary_id(summary):
+    """Stable id of a chunk summary, used in explanation handles"""
+    return hashlib.sha256(summary.encode("utf-8")).hexdigest()[:32]
+
+
+def explanation_key(summary_key, answer, question):
+    payload = "\0".join([summary_key, answer.strip().lower(), " ".join(question.split())])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ExplanationStore:
+    """SQLite store of chunk summaries by id and of the explanations generated for them.
+
+    MCQs generated with lazy explanations carry a handle (summary id, question,
+    answer) instead of an explanation; the summary is kept here so the explanation
+    can be generated when a user asks for it, and the result is kept for the next
+    user. Both tables are bounded and evict the least recently used rows first.
+    With path=None the store lives in memory and is lost on restart.
+    """
+    def __init__(self, path=None, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        with self._lock:
+            if path:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            for table, column in (("summaries", "summary"), ("explanations", "explanation")):
+                self._conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {table} (
+                        key TEXT PRIMARY KEY,
+                        {column} TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        last_access REAL NOT NULL
+                    )
+                """)
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_access ON {table}(last_access)")
+            self._conn.commit()
+
+    def _get(self, table, column, key):
+        with self._lock:
+            row = self._conn.execute(f"SELECT {column} FROM {table} WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._conn.execute(f"UPDATE {table} SET last_access = ? WHERE key = ?", (time.time(), key))
+                self._conn.commit()
+        return row[0] if row is not None else None
+
+    def _put(self, table, column, key, value):
+        size = len(key) + len(value)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {table} (key, {column}, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self._evict(table)
+            self._conn.commit()
+
+    def _evict(self, table):
+        # Each table gets half of the budget
+        limit = self.max_bytes // 2
+        total = self._conn.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+        while total > limit:
+            row = self._conn.execute(f"SELECT key, size FROM {table} ORDER BY last_access ASC LIMIT 1").fetchone()
+            if row is None:
+                break
+            self._conn.execute(f"DELETE FROM {table} WHERE key = ?", (row[0],))
+            total -= row[1]
+
+    def put_summary(self, summary):
+        """Store a chunk summary and return its id"""
+        key = summary_id(summary)
+        self._put("summaries", "summary", key, summary)
+        return key
+
+    def get_summary(self, key):
+        return self._get("summaries", "summary", key)
+
+    def get_explanation(self, summary_key, answer, question):
+        explanation = self._get("explanations", "explanation", explanation_key(summary_key, answer, question))
+        with self._lock:
+            if explanation is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return explanation
+
+    def put_explanation(self, summary_key, answer, question, explanation):
+        self._put("explanations", "explanation", explanation_key(summary_key, answer, question), explanation)
+
+    def stats(self):
+        with self._lock:
+            counts = {
+                table: self._conn.execute(f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM {table}").fetchone()
+                for table in ("summaries", "explanations")
+            }
+            lookups = self.hits + self.misses
+            return {
+                "summaries": counts["summaries"][0],
+                "explanations": counts["explanations"][0],
+                "bytes": counts["summaries"][1] + counts["explanations"][1],
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,82 @@
+import time
+import contextvars
+from contextlib import contextmanager
+
+
+class GenerationProfile:
+    """Decoding and extraction settings trading generation quality for speed"""
+    def __init__(self, name, summary_beams, question_beams, question_sequences, explanation_beams,
+                 keyword_mode=None, wordnet_distractors=True, lazy_explanations=False):
+        self.name = name
+        self.summary_beams = summary_beams
+        # num_beams of a question batch is picked from these
+        self.question_beams = question_beams
+        # Candidate questions generated per answer, the best one is kept
+        self.question_sequences = question_sequences
+        self.explanation_beams = explanation_beams
+        # Keyword extractor used unless the request names one (None = the generator's default)
+        self.keyword_mode = keyword_mode
+        self.wordnet_distractors = wordnet_distractors
+        # Leave explanations for /api/explanations instead of generating them with the MCQs
+        self.lazy_explanations = lazy_explanations
+
+
+PROFILES = {
+    # Greedy decoding, one candidate question, no pke or WordNet, explanations on demand
+    "fast": GenerationProfile("fast", summary_beams=1, question_beams=[1], question_sequences=1,
+                              explanation_beams=1, keyword_mode="fast", wordnet_distractors=False,
+                              lazy_explanations=True),
+    "balanced": GenerationProfile("balanced", summary_beams=2, question_beams=[2, 3], question_sequences=2,
+                                  explanation_beams=2),
+    # The full pipeline
+    "quality": GenerationProfile("quality", summary_beams=4, question_beams=[3, 4, 5], question_sequences=2,
+                                 explanation_beams=4),
+}
+
+# Profile of the chunk being processed in this thread, see use_profile()
+_current_profile = contextvars.ContextVar("mcq_generation_profile", default=None)
+
+
+def get_profile(name):
+    if name not in PROFILES:
+        raise ValueError(f"Unknown profile '{name}', expected one of {', '.join(PROFILES)}")
+    return PROFILES[name]
+
+
+@contextmanager
+def use_profile(profile):
+    token = _current_profile.set(profile)
+    try:
+        yield
+    finally:
+        _current_profile.reset(token)
+
+
+def current_profile():
+    """Profile of the current chunk; outside one, e.g. for on-demand explanations, the quality profile"""
+    return _current_profile.get() or PROFILES["quality"]
+
+
+class Deadline:
+    """Time budget of one request, counted from when it is created.
+
+    Once it has passed the pipeline starts no more chunks or chunk steps, and sets
+    reached so the caller can tell a cut-short result from a complete one. Deadlines
+    pickle into chunk workers; the monotonic clock is shared by forked processes.
+    """
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.reached = False
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def passed(self):
+        """Whether the deadline has passed, recording it in reached if so"""
+        if self.expired():
+            self.reached = True
+        return self.reached
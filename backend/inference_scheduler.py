@@ -0,0 +1,186 @@
+import time
+import threading
+from concurrent.futures import Future
+from metrics import BATCH_SIZE_BUCKETS, SCHEDULER_BATCH_SIZE
+
+
+class _GenerationRequest:
+    def __init__(self, role, prompts, settings, key):
+        self.role = role
+        self.prompts = prompts
+        self.settings = settings
+        self.key = key
+        self.enqueued_at = time.monotonic()
+        self.future = Future()
+
+
+class InferenceScheduler:
+    """Owns the seq2seq models and merges generate() calls from concurrent requests into batches.
+
+    Requests for the same model with compatible decoding settings are grouped until
+    max_batch_size prompts are waiting or the oldest has waited max_wait_ms, then run
+    as one padded batch on the scheduler thread. Only that thread touches the models,
+    so callers on any number of Flask or job threads are safe.
+
+    max_length is not part of compatibility: a batch decodes up to the largest
+    requested length and each result is cut back to its own request's limit. Beam
+    search cut back that way can differ from decoding at the shorter length, so
+    requests that must be reproducible pass exact_length and only share batches
+    with requests of the same max_length.
+    """
+    def __init__(self, device, max_batch_size=16, max_wait_ms=20, max_input_length=512):
+        self.device = device
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_input_length = max_input_length
+        self._roles = {}
+        self._pending = []
+        self._cond = threading.Condition()
+        self._stopped = False
+
+        self.requests_total = 0
+        self.batches_total = 0
+        self.prompts_total = 0
+        self.wait_seconds_total = 0.0
+        self.batch_size_counts = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.batch_size_overflow = 0
+
+        self._thread = threading.Thread(target=self._loop, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def register(self, role, model, tokenizer):
+        self._roles[role] = (model, tokenizer)
+
+    def _group_key(self, role, settings, exact_length=False):
+        model, _ = self._roles[role]
+        # Temperature only matters when sampling
+        ignored = set() if settings.get("do_sample") else {"temperature"}
+        if not exact_length:
+            ignored.add("max_length")
+        return (id(model), tuple(sorted((k, v) for k, v in settings.items() if k not in ignored)))
+
+    def generate(self, role, prompts, exact_length=False, **settings):
+        """Queue prompts for a role and block until the batch containing them has run.
+
+        Returns num_return_sequences decoded texts per prompt. With exact_length the
+        prompts are only batched with requests decoding to the same max_length.
+        """
+        if not prompts:
+            return []
+        request = _GenerationRequest(role, list(prompts), settings,
+                                     self._group_key(role, settings, exact_length))
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Inference scheduler has been stopped")
+            self._pending.append(request)
+            self._cond.notify_all()
+        return request.future.result()
+
+    def _compatible_size(self, key):
+        return sum(len(r.prompts) for r in self._pending if r.key == key)
+
+    def _take(self, key):
+        batch = []
+        size = 0
+        remaining = []
+        for request in self._pending:
+            if request.key == key and (not batch or size + len(request.prompts) <= self.max_batch_size):
+                batch.append(request)
+                size += len(request.prompts)
+            else:
+                remaining.append(request)
+        self._pending = remaining
+        return batch
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+
+                # Give compatible requests a short window to join the oldest one
+                key = self._pending[0].key
+                deadline = self._pending[0].enqueued_at + self.max_wait
+                while self._compatible_size(key) < self.max_batch_size and not self._stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._take(key)
+
+            self._run(batch)
+
+    def _run(self, batch):
+        role = batch[0].role
+        model, tokenizer = self._roles[role]
+        prompts = [prompt for request in batch for prompt in request.prompts]
+        settings = dict(batch[0].settings)
+        limits = [request.settings.get("max_length") for request in batch]
+        if all(limit is not None for limit in limits):
+            settings["max_length"] = max(limits)
+
+        started = time.monotonic()
+        self._record(batch, len(prompts), started)
+        try:
+            inputs = tokenizer(prompts, max_length=self.max_input_length, padding=True,
+                               truncation=True, return_tensors="pt").to(self.device)
+            outputs = model.generate(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                **settings
+            )
+
+            # Sequences come back grouped per prompt, num_return_sequences at a time
+            per_prompt = settings.get("num_return_sequences", 1)
+            offset = 0
+            for request, limit in zip(batch, limits):
+                count = len(request.prompts) * per_prompt
+                sequences = outputs[offset:offset + count]
+                offset += count
+                texts = [tokenizer.decode(seq[:limit] if limit else seq, skip_special_tokens=True)
+                         for seq in sequences]
+                request.future.set_result(
+                    [texts[i * per_prompt:(i + 1) * per_prompt] for i in range(len(request.prompts))]
+                )
+        except Exception as e:
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+
+    def _record(self, batch, size, started):
+        with self._cond:
+            self.requests_total += len(batch)
+            self.batches_total += 1
+            self.prompts_total += size
+            self.wait_seconds_total += sum(started - request.enqueued_at for request in batch)
+            for bucket in BATCH_SIZE_BUCKETS:
+                if size <= bucket:
+                    self.batch_size_counts[bucket] += 1
+                    break
+            else:
+                self.batch_size_overflow += 1
+        SCHEDULER_BATCH_SIZE.observe(size, role=batch[0].role)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._pending),
+                "queued_prompts": sum(len(r.prompts) for r in self._pending),
+                "requests_total": self.requests_total,
+                "batches_total": self.batches_total,
+                "prompts_total": self.prompts_total,
+                "mean_batch_size": round(self.prompts_total / self.batches_total, 2) if self.batches_total else 0.0,
+                "mean_wait_ms": round(self.wait_seconds_total / self.requests_total * 1000, 2) if self.requests_total else 0.0,
+                "batch_size_histogram": {str(bucket): count for bucket, count in self.batch_size_counts.items()},
+                "batch_size_overflow": self.batch_size_overflow
+            }
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            pending, self._pending = self._pending, []
+            self._cond.notify_all()
+        for request in pending:
+            request.future.set_exception(RuntimeError("Inference scheduler has been stopped"))
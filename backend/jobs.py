@@ -0,0 +1,135 @@
+import time
+import uuid
+import threading
+import traceback
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue already holds the configured maximum of pending jobs"""
+
+
+class Job:
+    """Progress and partial results of one background MCQ generation"""
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.chunks_total = None
+        self.chunks_done = 0
+        # Pages covered by the finished chunks of a PDF, and pages to read; PDF chunks
+        # are cut while pages are extracted, so chunks_total is only known at the end
+        self.pages_done = None
+        self.pages_total = None
+        self.mcqs = []
+        self.error = None
+        self._lock = threading.Lock()
+
+    def update(self, chunks_done, chunks_total, chunk_mcqs, pages=None):
+        """Progress callback handed to MCQGenerator.process_text/process_pdf"""
+        with self._lock:
+            self.chunks_done = chunks_done
+            self.chunks_total = chunks_total
+            if pages is not None:
+                self.pages_done, self.pages_total = pages
+            self.mcqs.extend(chunk_mcqs)
+
+    def eta_seconds(self):
+        if self.status != "running":
+            return None
+        if self.chunks_done and self.chunks_total:
+            done, total = self.chunks_done, self.chunks_total
+        elif self.pages_done and self.pages_total:
+            done, total = self.pages_done, self.pages_total
+        else:
+            return None
+        elapsed = time.time() - self.started_at
+        return round(elapsed / done * max(0, total - done), 1)
+
+    @property
+    def finished(self):
+        return self.status in ("completed", "failed")
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "chunks_done": self.chunks_done,
+                "chunks_total": self.chunks_total,
+                "pages_done": self.pages_done,
+                "pages_total": self.pages_total,
+                "mcq_count": len(self.mcqs),
+                "eta_seconds": self.eta_seconds(),
+                "elapsed_seconds": round((self.finished_at or time.time()) - self.started_at, 1) if self.started_at else None,
+                "error": self.error
+            }
+
+    def mcqs_from(self, offset=0):
+        with self._lock:
+            return self.mcqs[offset:]
+
+
+class JobManager:
+    """Runs generation jobs on a bounded thread pool and keeps their progress for polling"""
+    def __init__(self, max_workers=1, max_queued=20, ttl_seconds=3600):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mcq-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, work, cleanup=None):
+        """Queue work(progress_callback) and return its Job right away.
+
+        cleanup, if given, runs after the job finishes whether it succeeded or not.
+        """
+        with self._lock:
+            self._prune()
+            queued = sum(1 for job in self._jobs.values() if job.status == "queued")
+            if queued >= self.max_queued:
+                raise QueueFullError(f"Too many queued jobs ({queued}), try again later")
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, work, cleanup)
+        return job
+
+    def _run(self, job, work, cleanup):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            work(job.update)
+            job.status = "completed"
+            if job.chunks_total is None:
+                job.chunks_total = 0
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}")
+            logger.error(traceback.format_exc())
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            if cleanup:
+                try:
+                    cleanup()
+                except Exception as e:
+                    logger.warning(f"Cleanup for job {job.id} failed: {e}")
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self):
+        # Forget finished jobs once their results have been available for ttl_seconds
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and now - job.finished_at > self.ttl_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
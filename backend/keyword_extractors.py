@@ -0,0 +1,106 @@
+import numpy as np
+
+# spaCy entity labels kept as keyword candidates
+KEYWORD_ENTITY_LABELS = {'PERSON', 'ORG', 'GPE', 'LOC', 'PRODUCT', 'EVENT', 'WORK_OF_ART', 'LAW', 'LANGUAGE',
+                         'DATE', 'MONEY', 'PERCENT', 'QUANTITY'}
+
+
+def spacy_candidates(doc):
+    """Entities and short noun chunks of a parsed doc"""
+    candidates = [ent.text for ent in doc.ents if ent.label_ in KEYWORD_ENTITY_LABELS]
+    # Keep phrases of reasonable length
+    candidates.extend(chunk.text for chunk in doc.noun_chunks if len(chunk.text.split()) <= 3)
+    return candidates
+
+
+def cosine_similarities(embeddings, target):
+    norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(target)
+    return np.dot(embeddings, target) / np.maximum(norms, 1e-12)
+
+
+def mmr_order(embeddings, text_embedding, diversity=0.5):
+    """Order candidates by maximal marginal relevance to the text.
+
+    Each step picks the candidate with the best trade-off between similarity to
+    the text and dissimilarity to the candidates already picked; diversity=0 is a
+    plain similarity ranking.
+    """
+    count = len(embeddings)
+    if count == 0:
+        return []
+    relevance = cosine_similarities(embeddings, text_embedding)
+    normalized = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    pairwise = normalized @ normalized.T
+
+    order = [int(np.argmax(relevance))]
+    # Highest similarity of each candidate to any picked one, updated one row at a time
+    redundancy = pairwise[order[0]].copy()
+    remaining = np.ones(count, dtype=bool)
+    remaining[order[0]] = False
+    while len(order) < count:
+        scores = (1 - diversity) * relevance - diversity * redundancy
+        scores[~remaining] = -np.inf
+        best = int(np.argmax(scores))
+        order.append(best)
+        remaining[best] = False
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+    return order
+
+
+class KeywordExtractor:
+    """Collects keyword candidates from a parsed text and ranks them against the text embedding"""
+    name = None
+
+    def candidates(self, text, doc, n=10):
+        return spacy_candidates(doc)
+
+    def rank(self, keywords, keyword_embeddings, text_embedding):
+        """Indices of keywords, best first"""
+        similarities = cosine_similarities(keyword_embeddings, text_embedding)
+        return sorted(range(len(keywords)), key=lambda i: (similarities[i], keywords[i]), reverse=True)
+
+
+class PkeKeywordExtractor(KeywordExtractor):
+    """pke MultipartiteRank keyphrases plus spaCy candidates, ranked by similarity to the text"""
+    name = "quality"
+
+    def __init__(self, on_error=None):
+        # Called with the exception when pke fails; spaCy candidates are still returned
+        self.on_error = on_error
+
+    def candidates(self, text, doc, n=10):
+        keywords = []
+        try:
+            import pke
+
+            extractor = pke.unsupervised.MultipartiteRank()
+            # Hand pke the Doc we already parsed, so it neither loads its own spaCy pipeline nor re-parses
+            extractor.load_document(input=doc, language='en')
+            pos = {'PROPN', 'NOUN', 'ADJ'}
+            extractor.candidate_selection(pos=pos)
+            extractor.candidate_weighting(alpha=1.1, threshold=0.74, method='average')
+            keywords.extend(kw[0] for kw in extractor.get_n_best(n=n*2))
+        except Exception as e:
+            print(f"pke extraction error: {e}")
+            if self.on_error is not None:
+                self.on_error(e)
+        keywords.extend(spacy_candidates(doc))
+        return keywords
+
+
+class EmbeddingKeywordExtractor(KeywordExtractor):
+    """spaCy entities and noun chunks ranked by MMR over their sentence embeddings.
+
+    Skips building pke's topic graph, which dominates keyword time on long chunks;
+    the embeddings are the ones the pipeline computes for every candidate anyway.
+    """
+    name = "fast"
+
+    def __init__(self, diversity=0.5):
+        self.diversity = diversity
+
+    def rank(self, keywords, keyword_embeddings, text_embedding):
+        return mmr_order(keyword_embeddings, text_embedding, self.diversity)
+
+
+KEYWORD_MODES = ("quality", "fast")
@@ -1,40 +1,65 @@
 import torch
 import nltk
-import pke
 import random
-import spacy
 import numpy as np
-from flashtext import KeywordProcessor
-from transformers import T5ForConditionalGeneration, T5Tokenizer
-from sense2vec import Sense2Vec
-from sentence_transformers import SentenceTransformer
-from similarity.normalized_levenshtein import NormalizedLevenshtein
+import Levenshtein
 from nltk.corpus import wordnet, stopwords
-import pdfplumber
-import re
 import os
-
-# Download required nltk datasets
-nltk.download('punkt', quiet=True)
-nltk.download('wordnet', quiet=True)
-nltk.download('stopwords', quiet=True)
-
-def extract_text_from_pdf(pdf_path):
-    """Extract text from a PDF file using pdfplumber"""
-    full_text = ""
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    full_text += text + "\n"
-        return full_text.strip()
-    except Exception as e:
-        print(f"Error extracting text from PDF: {e}")
-        return ""
+import time
+import logging
+from collections import deque
+from model_registry import ModelRegistry
+from embedding_cache import EmbeddingCache
+from s2v_table import table_exists
+from model_snapshot import ModelSnapshot, snapshot_exists
+from chunk_pool import ChunkWorkerPool, fork_available
+from result_cache import ResultCache
+from explanation_store import ExplanationStore, summary_id
+from inference_scheduler import InferenceScheduler
+from pdf_extract import iter_pdf_pages
+from keyword_extractors import PkeKeywordExtractor, EmbeddingKeywordExtractor, KEYWORD_MODES
+from dedup_index import DedupIndex
+from seeding import seeded_chunk, seeded_random, chunk_random, chunk_seeded
+from generation_profiles import get_profile, use_profile, current_profile
+from timing import StageTimer, collect_telemetry, span, count_failure, count_skipped
+from metrics import STAGE_SECONDS, FAILURES, CHUNKS, MCQS, DEDUP_SKIPPED
+
+logger = logging.getLogger(__name__)
+
+# NLTK resources the pipeline needs, as (resource path, package name)
+NLTK_RESOURCES = [
+    ('tokenizers/punkt', 'punkt'),
+    ('corpora/wordnet', 'wordnet'),
+    ('corpora/stopwords', 'stopwords')
+]
+
+# Pipeline components skipped when loading spaCy. Only NER, noun chunks (parser)
+# and POS tags (tagger + attribute_ruler) are used; lemmas are never read
+SPACY_EXCLUDE = ["lemmatizer", "senter"]
+# Texts per nlp.pipe batch
+SPACY_BATCH_SIZE = 64
+
+# Short passage run through every stage once at startup
+WARM_UP_TEXT = (
+    "Photosynthesis is the process by which green plants use sunlight, water and carbon dioxide "
+    "to produce glucose and oxygen. It takes place in the chloroplasts, which contain the pigment "
+    "chlorophyll. The oxygen released by plants is essential for most life on Earth."
+)
+
+def ensure_nltk_data(offline=False):
+    """Download missing NLTK datasets, or fail with a clear error when offline"""
+    for resource, package in NLTK_RESOURCES:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            if offline:
+                raise RuntimeError(f"NLTK data '{package}' is missing and offline mode is enabled. "
+                                   f"Install it with: python -m nltk.downloader {package}")
+            print(f"Downloading NLTK data '{package}'...")
+            nltk.download(package, quiet=True)
 
 def chunk_text(text, chunk_size=2000, overlap=200):
-    """Split text into chunks with overlap for better context preservation"""
+    """Split text into word-count chunks with overlap (see chunk_text_by_tokens for model-window chunks)"""
     words = text.split()
     chunks = []
     
@@ -49,80 +74,383 @@ def chunk_text(text, chunk_size=2000, overlap=200):
 
     return chunks
 
+# T5 input window, and the task prefix every summary prompt spends part of it on
+MODEL_MAX_TOKENS = 512
+SUMMARY_PREFIX = "summarize: "
+
+def _sentence_batches(texts, tokenizer=None, max_carry_tokens=None):
+    """Sentences of a sequence of texts, one list per text.
+
+    The last sentence of each text is held back and tokenized again with the start
+    of the next one, so a sentence broken across a page boundary stays whole. A held
+    back sentence longer than max_carry_tokens (in tokenizer tokens) is split into
+    windows of that many tokens: the full ones are yielded and only the rest is held
+    back, so unpunctuated pages such as slides or tables are not re-tokenized page
+    after page, and still fill whole chunks.
+    """
+    carry = ""
+    for text in texts:
+        sentences = nltk.sent_tokenize(f"{carry} {text}" if carry else text)
+        if not sentences:
+            continue
+        carry = sentences.pop()
+        if max_carry_tokens is not None:
+            ids = tokenizer(carry, add_special_tokens=False)["input_ids"]
+            if len(ids) > max_carry_tokens:
+                split = (len(ids) - 1) // max_carry_tokens * max_carry_tokens
+                sentences.extend(tokenizer.decode(ids[start:start + max_carry_tokens], skip_special_tokens=True)
+                                 for start in range(0, split, max_carry_tokens))
+                carry = tokenizer.decode(ids[split:], skip_special_tokens=True)
+        if sentences:
+            yield sentences
+    if carry:
+        yield [carry]
+
+def iter_chunks_by_tokens(texts, tokenizer, max_tokens=MODEL_MAX_TOKENS, overlap=50, reserved_tokens=0):
+    """Yield sentence-aligned chunks that fit the model window from a sequence of texts, such as PDF pages.
+
+    Sizes are measured with the model tokenizer. max_tokens includes reserved_tokens
+    (prompt prefix and end-of-sequence token); overlap is the number of tokens of
+    whole trailing sentences repeated at the start of the next chunk. Sentences
+    longer than a chunk are split on token boundaries, so no text is dropped.
+    Chunks are yielded as soon as they are full, before later texts are read.
+    """
+    budget = max(1, max_tokens - reserved_tokens)
+    overlap = max(0, min(overlap, budget // 2))
+
+    current = []
+    current_tokens = 0
+    for sentences in _sentence_batches(texts, tokenizer, budget):
+        token_ids = tokenizer(sentences, add_special_tokens=False)["input_ids"]
+
+        # Split any sentence that alone exceeds the budget
+        pieces = []
+        for sentence, ids in zip(sentences, token_ids):
+            if len(ids) <= budget:
+                pieces.append((sentence, len(ids)))
+                continue
+            for start in range(0, len(ids), budget):
+                window = ids[start:start + budget]
+                pieces.append((tokenizer.decode(window, skip_special_tokens=True), len(window)))
+
+        for piece, length in pieces:
+            if current and current_tokens + length > budget:
+                yield " ".join(p for p, _ in current)
+
+                # Carry whole trailing sentences that fit in the overlap into the next chunk
+                carried = []
+                carried_tokens = 0
+                for previous, previous_length in reversed(current):
+                    if carried_tokens + previous_length > overlap or carried_tokens + previous_length + length > budget:
+                        break
+                    carried.insert(0, (previous, previous_length))
+                    carried_tokens += previous_length
+                current = carried
+                current_tokens = carried_tokens
+
+            current.append((piece, length))
+            current_tokens += length
+
+    if current:
+        yield " ".join(p for p, _ in current)
+
+def chunk_text_by_tokens(text, tokenizer, max_tokens=MODEL_MAX_TOKENS, overlap=50, reserved_tokens=0):
+    """Split text into sentence-aligned chunks that fit the model window (see iter_chunks_by_tokens)"""
+    return list(iter_chunks_by_tokens([text], tokenizer, max_tokens, overlap, reserved_tokens))
+
+class ChunkAnalysis:
+    """Parsed doc, ranked keywords and embeddings of a chunk summary, computed once per chunk"""
+    def __init__(self, text, doc, keywords, keyword_embeddings, text_embedding, sentences, sentence_embeddings):
+        self.text = text
+        self.doc = doc
+        self.keywords = keywords
+        self.keyword_embeddings = keyword_embeddings
+        self.text_embedding = text_embedding
+        self.sentences = sentences
+        self.sentence_embeddings = sentence_embeddings
+
+        # First entity label seen for each entity text
+        self.entity_labels = {}
+        for ent in doc.ents:
+            self.entity_labels.setdefault(ent.text.lower(), ent.label_)
+        # Noun chunks headed by an entity token share its label, so they need no parse of their own
+        for chunk in doc.noun_chunks:
+            if chunk.root.ent_type_:
+                self.entity_labels.setdefault(chunk.text.lower(), chunk.root.ent_type_)
+
+    def embedding_for(self, text):
+        """Return the stored embedding of the full text, one of its sentences or a keyword, if any"""
+        if text == self.text:
+            return self.text_embedding
+        if text in self.keywords:
+            return self.keyword_embeddings[self.keywords.index(text)]
+        if self.sentence_embeddings is not None and text in self.sentences:
+            return self.sentence_embeddings[self.sentences.index(text)]
+        return None
+
 class MCQGenerator:
-    def __init__(self, use_gpu=True):
+    def __init__(self, use_gpu=True, batch_generation=True, embedding_cache_mb=64, embedding_cache_path=None,
+                 chunk_workers=0, threads_per_worker=None, result_cache_path=None, result_cache_mb=256,
+                 use_scheduler=False, scheduler_batch_size=16, scheduler_wait_ms=20,
+                 quantize=None, intra_op_threads=None, inter_op_threads=None, models_dir='models',
+                 offline=False, explanation_store_path=None, explanation_store_mb=64, keyword_mode="quality",
+                 pdf_workers=0, dedup_threshold=0.9, question_bank=None, profile="quality"):
+        self.models_dir = models_dir
+        # Speed/quality profile of requests that do not name one (see generation_profiles.py)
+        self.profile = get_profile(profile).name
+        # Keyword extraction engines; requests pick one by name, keyword_mode is the default
+        self.keyword_extractors = {
+            "quality": PkeKeywordExtractor(on_error=lambda e: count_failure("keywords.pke")),
+            "fast": EmbeddingKeywordExtractor()
+        }
+        self.keyword_mode = keyword_mode
+        self._keyword_extractor(keyword_mode)
+        # Forked processes extracting PDF pages in parallel (0 or 1 = in this process)
+        self.pdf_workers = pdf_workers
+        # Cosine similarity above which an answer or question repeats one used earlier
+        # in the same document (0 disables cross-chunk deduplication)
+        self.dedup_threshold = dedup_threshold
+        # Optional QuestionBank that keeps every MCQ served for a document
+        self.question_bank = question_bank
+        # Wall time and call counts per pipeline stage, and of each startup step
+        self.timer = StageTimer()
+        self.startup_timer = StageTimer()
+        # Never touch the network: models, tokenizers and NLTK/spaCy data must be installed locally
+        self.offline = offline
+        if offline:
+            os.environ.setdefault("HF_HUB_OFFLINE", "1")
+            os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+        with self.startup_timer.stage("nltk"):
+            ensure_nltk_data(offline)
         self.device = torch.device("cuda" if torch.cuda.is_available() and use_gpu else "cpu")
         print(f"Using device: {self.device}")
-        self._load_models()
+        self._configure_threads(intra_op_threads, inter_op_threads)
+        # None for fp32, or "int8" for dynamic quantization of the Linear layers
+        self.quantize = quantize
+        # Run question and explanation generation as one padded batch per chunk
+        self.batch_generation = batch_generation
+        with self.startup_timer.stage("models"):
+            self._load_models()
+
+        # Every sentence embedding goes through a bounded LRU cache
+        with self.startup_timer.stage("caches"):
+            self.embeddings = EmbeddingCache(
+                self.sentence_model,
+                max_bytes=int(embedding_cache_mb * 1024 * 1024),
+                persist_path=embedding_cache_path
+            )
         self.stop_words = set(stopwords.words('english'))
+        with self.startup_timer.stage("spacy"):
+            self.nlp = self._load_spacy()
+
+        # Optionally reuse summaries, keywords and MCQs of chunks seen before
+        self.result_cache = None
+        if result_cache_path:
+            with self.startup_timer.stage("caches"):
+                self.result_cache = ResultCache(result_cache_path, max_bytes=int(result_cache_mb * 1024 * 1024))
+
+        # Summaries behind lazy explanation handles, and the explanations generated for them
+        with self.startup_timer.stage("caches"):
+            self.explanation_store = ExplanationStore(explanation_store_path,
+                                                      max_bytes=int(explanation_store_mb * 1024 * 1024))
+
+        # Optionally spread chunks over forked worker processes that share the loaded models
+        self.chunk_pool = None
+        if chunk_workers > 1:
+            if fork_available():
+                self.chunk_pool = ChunkWorkerPool(self, chunk_workers, threads_per_worker)
+                print(f"Processing chunks in {chunk_workers} worker processes "
+                      f"with {self.chunk_pool.threads_per_worker} threads each")
+                # Fork now, while this is the only thread touching the models; the scheduler starts after
+                with self.startup_timer.stage("chunk_workers"):
+                    self.chunk_pool.start()
+            else:
+                print("Process fork is not available on this platform, processing chunks sequentially")
+
+        # Optionally let one scheduler thread own the T5 models and batch generate()
+        # calls across all in-flight requests
+        self.scheduler = None
+        if use_scheduler:
+            self.scheduler = InferenceScheduler(
+                self.device,
+                max_batch_size=scheduler_batch_size,
+                max_wait_ms=scheduler_wait_ms,
+                max_input_length=MODEL_MAX_TOKENS
+            )
+            for role, (model, tokenizer) in self._generation_roles.items():
+                self.scheduler.register(role, model, tokenizer)
+
+    def _load_spacy(self):
+        import spacy
+
+        spacy_path = self.snapshot.spacy_path() if self.snapshot is not None else None
+        if spacy_path:
+            return spacy.load(spacy_path, exclude=SPACY_EXCLUDE)
         try:
-            self.nlp = spacy.load('en_core_web_sm')
-        except:
+            return spacy.load('en_core_web_sm', exclude=SPACY_EXCLUDE)
+        except OSError:
+            if self.offline:
+                raise RuntimeError("spaCy model 'en_core_web_sm' is missing and offline mode is enabled. "
+                                   "Install it with: python -m spacy download en_core_web_sm")
             print("Downloading spaCy model...")
-            import os
             os.system("python -m spacy download en_core_web_sm")
-            self.nlp = spacy.load('en_core_web_sm')
+            return spacy.load('en_core_web_sm', exclude=SPACY_EXCLUDE)
+
+    def parse_texts(self, texts):
+        """Parse texts in nlp.pipe batches, returning one Doc per text; repeated texts are parsed once"""
+        unique = list(dict.fromkeys(texts))
+        with span("model.spacy"):
+            docs = dict(zip(unique, self.nlp.pipe(unique, batch_size=SPACY_BATCH_SIZE)))
+        return [docs[text] for text in texts]
+
+    def entity_types(self, answers, analysis=None):
+        """Entity label of each answer, or None.
+
+        Labels found in the chunk's parsed doc are reused; the remaining answers are
+        parsed together in one batch and their labels stored in the analysis.
+        """
+        labels = analysis.entity_labels if analysis is not None else {}
+        missing = [answer for answer in dict.fromkeys(answers) if answer.lower() not in labels]
+        if missing:
+            for answer, doc in zip(missing, self.parse_texts(missing)):
+                labels[answer.lower()] = doc.ents[0].label_ if doc.ents else None
+        return [labels[answer.lower()] for answer in answers]
+
+    def warm_up(self):
+        """Run a short passage through every stage so the first request skips one-time setup costs"""
+        print("Warming up models...")
+        with self.startup_timer.stage("warm_up"):
+            self.process_chunk_result(WARM_UP_TEXT, num_questions=1)
+
+    def startup_report(self):
+        """Seconds spent in each startup step and loading each checkpoint"""
+        return {
+            "stages": self.startup_timer.snapshot(),
+            "models": self.models.load_report()
+        }
+
+    def _configure_threads(self, intra_op_threads=None, inter_op_threads=None):
+        """Set explicit torch CPU thread pools instead of relying on the defaults"""
+        if intra_op_threads:
+            torch.set_num_threads(intra_op_threads)
+        if inter_op_threads:
+            try:
+                torch.set_num_interop_threads(inter_op_threads)
+            except RuntimeError as e:
+                # Only allowed once, before any inter-op parallel work has started
+                print(f"Could not set inter-op threads: {e}")
+        print(f"Torch threads: intra-op {torch.get_num_threads()}, inter-op {torch.get_num_interop_threads()}")
 
     def _load_models(self):
-        # Load T5 models for summarization, question generation, and explanation
+        # Load T5 models for summarization, question generation, and explanation.
+        # The registry loads each checkpoint once, so summary and explanation share t5-base.
+        # A snapshot built by model_snapshot.py lets the weights be memory-mapped instead of parsed
         print("Loading models...")
-        self.summary_model = T5ForConditionalGeneration.from_pretrained('models/t5-base').to(self.device)
-        self.question_model = T5ForConditionalGeneration.from_pretrained('models/t5_squad_v1').to(self.device)
-        self.explanation_model = T5ForConditionalGeneration.from_pretrained('models/t5-base').to(self.device)
+        snapshot_path = os.path.join(self.models_dir, 'snapshot')
+        self.snapshot = ModelSnapshot(snapshot_path) if snapshot_exists(snapshot_path) else None
+        self.models = ModelRegistry(self.device, quantize=self.quantize, local_files_only=self.offline,
+                                    snapshot=self.snapshot)
+        self.summary_model = self.models.t5_model(os.path.join(self.models_dir, 't5-base'), 'summary')
+        self.question_model = self.models.t5_model(os.path.join(self.models_dir, 't5_squad_v1'), 'question')
+        self.explanation_model = self.models.t5_model(os.path.join(self.models_dir, 't5-base'), 'explanation')
 
         # Load tokenizers
-        self.summary_tokenizer = T5Tokenizer.from_pretrained('models/t5-base')
-        self.question_tokenizer = T5Tokenizer.from_pretrained('models/t5_squad_v1')
-        self.explanation_tokenizer = T5Tokenizer.from_pretrained('models/t5-base')
+        self.summary_tokenizer = self.models.t5_tokenizer(os.path.join(self.models_dir, 't5-base'), 'summary')
+        self.question_tokenizer = self.models.t5_tokenizer(os.path.join(self.models_dir, 't5_squad_v1'), 'question')
+        self.explanation_tokenizer = self.models.t5_tokenizer(os.path.join(self.models_dir, 't5-base'), 'explanation')
 
         # Load sentence transformer for better keyword ranking and distractor filtering
-        self.sentence_model = SentenceTransformer('models/msmarco-distilbert-base-v3')
+        self.sentence_model = self.models.sentence_model(os.path.join(self.models_dir, 'msmarco-distilbert-base-v3'), 'embedding')
 
-        # Load Sense2Vec for distractor generation
-        self.s2v = Sense2Vec().from_disk('models/s2v_old')
+        # Load Sense2Vec for distractor generation, preferring the precomputed
+        # memory-mapped neighbour table (see s2v_table.py) over the live vectors
+        if table_exists(os.path.join(self.models_dir, 's2v_table')):
+            self.s2v = self.models.sense2vec_table(os.path.join(self.models_dir, 's2v_table'), 'distractors')
+        else:
+            self.s2v = self.models.sense2vec(os.path.join(self.models_dir, 's2v_old'), 'distractors')
+
+        # Model and tokenizer used by each generation role
+        self._generation_roles = {
+            "summary": (self.summary_model, self.summary_tokenizer),
+            "question": (self.question_model, self.question_tokenizer),
+            "explanation": (self.explanation_model, self.explanation_tokenizer)
+        }
 
-        # Initialize Levenshtein similarity for option filtering
-        self.normalized_levenshtein = NormalizedLevenshtein()
         print("Models loaded successfully.")
 
+    def memory_report(self):
+        """Resident weight memory per loaded model, for sizing worker counts"""
+        return self.models.memory_report()
+
+    def _generate_texts(self, role, prompts, settings):
+        """Run a padded generate() batch for a model role, returning num_return_sequences texts per prompt.
+
+        With the inference scheduler enabled the batch is queued there instead, where it
+        may be merged with compatible batches from other requests; seeded chunks only
+        share batches decoding to their own max_length, to stay reproducible.
+        """
+        with span(f"model.{role}"):
+            if self.scheduler is not None:
+                return self.scheduler.generate(role, prompts, exact_length=chunk_seeded(), **settings)
+
+            model, tokenizer = self._generation_roles[role]
+            inputs = tokenizer(prompts, max_length=MODEL_MAX_TOKENS, padding=True, truncation=True, return_tensors="pt").to(self.device)
+            outputs = model.generate(
+                input_ids=inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                **settings
+            )
+
+            # Sequences come back grouped per prompt, num_return_sequences at a time
+            per_prompt = settings.get("num_return_sequences", 1)
+            texts = [tokenizer.decode(output, skip_special_tokens=True) for output in outputs]
+            return [texts[i * per_prompt:(i + 1) * per_prompt] for i in range(len(prompts))]
+
     def generate_summary(self, text):
-        input_text = "summarize: " + text
-        inputs = self.summary_tokenizer.encode(input_text, return_tensors="pt", max_length=512, truncation=True).to(self.device)
-        summary_ids = self.summary_model.generate(
-            inputs,
-            num_beams=4,
-            max_length=min(150, len(text) // 3),
-            early_stopping=True,
-            no_repeat_ngram_size=2
-        )
-        return self.summary_tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-
-    def extract_keywords(self, text, n=10):
-        # Use multiple extraction methods for better results
-        keywords = []
-
-        # Method 1: Using pke
-        try:
-            extractor = pke.unsupervised.MultipartiteRank()
-            extractor.load_document(input=text, language='en')
-            pos = {'PROPN', 'NOUN', 'ADJ'}
-            extractor.candidate_selection(pos=pos)
-            extractor.candidate_weighting(alpha=1.1, threshold=0.74, method='average')
-            keyphrases = [kw[0] for kw in extractor.get_n_best(n=n*2)]
-            keywords.extend(keyphrases)
-        except Exception as e:
-            print(f"pke extraction error: {e}")
+        settings = {
+            "num_beams": current_profile().summary_beams,
+            "max_length": min(150, len(text) // 3),
+            "early_stopping": True,
+            "no_repeat_ngram_size": 2
+        }
+        return self._generate_texts("summary", [SUMMARY_PREFIX + text], settings)[0][0]
 
-        # Method 2: Using spaCy for entity recognition
-        doc = self.nlp(text)
-        for ent in doc.ents:
-            if ent.label_ in ['PERSON', 'ORG', 'GPE', 'LOC', 'PRODUCT', 'EVENT', 'WORK_OF_ART', 'LAW', 'LANGUAGE', 'DATE', 'MONEY', 'PERCENT', 'QUANTITY']:
-                keywords.append(ent.text)
+    def _keyword_extractor(self, keyword_mode=None):
+        mode = keyword_mode or self.keyword_mode
+        if mode not in self.keyword_extractors:
+            raise ValueError(f"Unknown keyword mode '{mode}', expected one of {', '.join(KEYWORD_MODES)}")
+        return self.keyword_extractors[mode]
 
-        # Method 3: Using noun chunks from spaCy
-        for chunk in doc.noun_chunks:
-            if len(chunk.text.split()) <= 3:  # Keep phrases of reasonable length
-                keywords.append(chunk.text)
+    def analyze_text(self, text, n=10, doc=None, keyword_mode=None):
+        """Parse text once and rank its keywords so later stages can reuse the results"""
+        extractor = self._keyword_extractor(keyword_mode)
+        if doc is None:
+            doc = self.parse_texts([text])[0]
+        keywords = self._candidate_keywords(text, doc, n=n, extractor=extractor)
+
+        # Rank keywords by importance in the text
+        text_embedding = self.embeddings.encode([text])[0]
+        if keywords:
+            keyword_embeddings = self.embeddings.encode(keywords)
+
+            # Rank keywords against the main text, keeping embeddings aligned with them
+            order = extractor.rank(keywords, keyword_embeddings, text_embedding)
+            keywords = [keywords[i] for i in order]
+            keyword_embeddings = keyword_embeddings[order]
+        else:
+            keyword_embeddings = np.zeros((0, len(text_embedding)), dtype=np.float32)
+
+        sentences = nltk.sent_tokenize(text)
+        sentence_embeddings = self.embeddings.encode(sentences) if sentences else None
+
+        return ChunkAnalysis(text, doc, keywords, keyword_embeddings, text_embedding,
+                             sentences, sentence_embeddings)
+
+    def _candidate_keywords(self, text, doc, n=10, extractor=None):
+        """Collect unique keyword candidates from the extractor and the spaCy parse of the text"""
+        if extractor is None:
+            extractor = self._keyword_extractor()
+        keywords = extractor.candidates(text, doc, n=n)
 
         # Filter and rank keywords
         filtered_keywords = []
@@ -139,31 +467,22 @@ class MCQGenerator:
                 seen.add(kw.lower())
                 unique_keywords.append(kw)
 
-        # Rank keywords by importance in the text
-        keyword_embeddings = self.sentence_model.encode(unique_keywords)
-        text_embedding = self.sentence_model.encode([text])[0]
-
-        # Calculate similarity to main text
-        similarities = np.dot(keyword_embeddings, text_embedding) / (
-            np.linalg.norm(keyword_embeddings, axis=1) * np.linalg.norm(text_embedding)
-        )
-
-        # Sort keywords by similarity and return top n
-        sorted_keywords = [x for _, x in sorted(zip(similarities, unique_keywords), reverse=True)]
-        return sorted_keywords[:n]
-
-    def generate_question(self, context, answer):
-        # Find the sentence containing the answer for better context
-        sentences = nltk.sent_tokenize(context)
-        answer_sentence = ""
+        return unique_keywords
+
+    def extract_keywords(self, text, n=10, analysis=None):
+        if analysis is None or analysis.text != text:
+            analysis = self.analyze_text(text, n=n)
+        return analysis.keywords[:n]
+
+    def _answer_sentence(self, context, answer, analysis=None):
+        """Find the sentence containing the answer for better context"""
+        sentences = analysis.sentences if analysis is not None and analysis.text == context else nltk.sent_tokenize(context)
         for sentence in sentences:
             if answer.lower() in sentence.lower():
-                answer_sentence = sentence
-                break
-
-        if not answer_sentence:
-            answer_sentence = context
+                return sentence
+        return context
 
+    def _question_prompt(self, answer, answer_sentence):
         # Use more specific prompts with randomization for variety
         templates = [
             f"generate a multiple choice question: {answer_sentence} answer: {answer}",
@@ -174,30 +493,21 @@ class MCQGenerator:
         ]
 
         # Choose a random template for variety
-        template = random.choice(templates)
+        return chunk_random("question_prompt", answer).choice(templates)
 
-        # Try different templates to generate questions
-        inputs = self.question_tokenizer(template, max_length=512, padding=False, truncation=True, return_tensors="pt").to(self.device)
-        
+    def _question_generation_settings(self, *keys):
         # Add randomness to generation parameters
-        num_beams = random.choice([3, 4, 5])
-        max_length = random.randint(32, 64)
-        
-        outputs = self.question_model.generate(
-            input_ids=inputs["input_ids"],
-            attention_mask=inputs["attention_mask"],
-            num_beams=num_beams,
-            num_return_sequences=2,
-            max_length=max_length,
-            temperature=random.uniform(0.7, 1.3)  # Add temperature for more randomness
-        )
-
-        questions = []
-        for output in outputs:
-            question = self.question_tokenizer.decode(output, skip_special_tokens=True).replace("question:", "").strip()
-            questions.append(question)
-
-        # Validate questions
+        rng = chunk_random("question_settings", *keys)
+        profile = current_profile()
+        num_beams = rng.choice(profile.question_beams)
+        return {
+            "num_beams": num_beams,
+            "num_return_sequences": min(profile.question_sequences, num_beams),
+            "max_length": rng.randint(32, 64),
+            "temperature": rng.uniform(0.7, 1.3)  # Add temperature for more randomness
+        }
+
+    def _valid_questions(self, questions, answer):
         valid_questions = []
         for q in questions:
             # Must end with question mark
@@ -209,15 +519,50 @@ class MCQGenerator:
                 # Must be a proper length
                 if 10 <= len(q) <= 150:
                     valid_questions.append(q)
+        return valid_questions
 
+    def _select_question(self, questions, answer, answer_sentence, analysis=None):
+        """Validate generated questions and return the best one, or a template fallback"""
+        valid_questions = self._valid_questions(questions, answer)
         if valid_questions:
             # Return the highest quality question
-            return max(valid_questions, key=lambda q: self._score_question(q, answer, answer_sentence))
+            return max(valid_questions, key=lambda q: self._score_question(q, answer, answer_sentence, analysis))
         else:
             # Fallback to a template question if generation fails
-            return self._create_template_question(answer, answer_sentence)
+            return self._create_template_question(answer, answer_sentence, analysis)
+
+    def _clean_question(self, text):
+        return text.replace("question:", "").strip()
+
+    def generate_question(self, context, answer, analysis=None):
+        answer_sentence = self._answer_sentence(context, answer, analysis)
+        template = self._question_prompt(answer, answer_sentence)
 
-    def _score_question(self, question, answer, context):
+        # Try different templates to generate questions
+        outputs = self._generate_texts("question", [template], self._question_generation_settings(answer))[0]
+        questions = [self._clean_question(output) for output in outputs]
+        return self._select_question(questions, answer, answer_sentence, analysis)
+
+    def generate_questions(self, context, answers, analysis=None):
+        """Generate one question per answer with a single padded batch through the question model"""
+        if not answers:
+            return []
+
+        answer_sentences = [self._answer_sentence(context, answer, analysis) for answer in answers]
+        prompts = [self._question_prompt(answer, sentence) for answer, sentence in zip(answers, answer_sentences)]
+        outputs = self._generate_texts("question", prompts, self._question_generation_settings())
+
+        candidates = [[self._clean_question(candidate) for candidate in texts] for texts in outputs]
+        if analysis is not None:
+            # Parse every answer that will need a template question in one batch
+            fallbacks = [answer for answer, texts in zip(answers, candidates) if not self._valid_questions(texts, answer)]
+            if fallbacks:
+                self.entity_types(fallbacks, analysis)
+
+        return [self._select_question(texts, answer, sentence, analysis)
+                for answer, sentence, texts in zip(answers, answer_sentences, candidates)]
+
+    def _score_question(self, question, answer, context, analysis=None):
         """Score question quality based on multiple factors"""
         score = 0
 
@@ -232,24 +577,23 @@ class MCQGenerator:
 
         # Check semantic relevance between question and context
         try:
-            question_embedding = self.sentence_model.encode([question])[0]
-            context_embedding = self.sentence_model.encode([context])[0]
+            question_embedding = self.embeddings.encode([question])[0]
+            context_embedding = analysis.embedding_for(context) if analysis is not None else None
+            if context_embedding is None:
+                context_embedding = self.embeddings.encode([context])[0]
             similarity = np.dot(question_embedding, context_embedding) / (
                 np.linalg.norm(question_embedding) * np.linalg.norm(context_embedding)
             )
             score += similarity * 3
-        except:
-            pass
+        except Exception as e:
+            logger.warning(f"Question relevance scoring failed for '{answer}': {e}")
+            count_failure("questions.scoring")
 
         return score
 
-    def _create_template_question(self, answer, context):
+    def _create_template_question(self, answer, context, analysis=None):
         """Create a template-based question when generation fails"""
-        doc = self.nlp(answer)
-        entity_type = None
-        for ent in doc.ents:
-            entity_type = ent.label_
-            break
+        entity_type = self.entity_types([answer], analysis)[0]
 
         # Choose template based on answer type with multiple options for each type
         templates = {
@@ -282,35 +626,44 @@ class MCQGenerator:
             ]
         }
 
+        rng = chunk_random("template_question", answer)
         if entity_type in templates:
-            return random.choice(templates[entity_type])
+            return rng.choice(templates[entity_type])
         else:
-            return random.choice(templates["GENERAL"])
+            return rng.choice(templates["GENERAL"])
 
-    def generate_explanation(self, context, answer, question):
+    def _explanation_prompt(self, context, answer, question):
         # Add randomness to the explanation prompt
         prompts = [
             f"explain: why '{answer}' is the correct answer to the question '{question}' based on this context: {context}",
             f"elaborate on why '{answer}' correctly answers '{question}' given this information: {context}",
             f"justify why '{answer}' is the right response to '{question}' considering: {context}"
         ]
-        
-        input_text = random.choice(prompts)
-        inputs = self.explanation_tokenizer.encode(input_text, return_tensors="pt", max_length=512, truncation=True).to(self.device)
-        
+        return chunk_random("explanation_prompt", answer).choice(prompts)
+
+    def _explanation_generation_settings(self, *keys):
         # Randomize generation parameters
-        temperature = random.uniform(0.8, 1.2)
-        max_length = random.randint(50, 100)
-        
-        explanation_ids = self.explanation_model.generate(
-            inputs,
-            num_beams=4,
-            max_length=max_length,
-            early_stopping=True,
-            no_repeat_ngram_size=2,
-            temperature=temperature
-        )
-        return self.explanation_tokenizer.decode(explanation_ids[0], skip_special_tokens=True)
+        rng = chunk_random("explanation_settings", *keys)
+        return {
+            "num_beams": current_profile().explanation_beams,
+            "max_length": rng.randint(50, 100),
+            "early_stopping": True,
+            "no_repeat_ngram_size": 2,
+            "temperature": rng.uniform(0.8, 1.2)
+        }
+
+    def generate_explanation(self, context, answer, question):
+        input_text = self._explanation_prompt(context, answer, question)
+        return self._generate_texts("explanation", [input_text], self._explanation_generation_settings(answer))[0][0]
+
+    def generate_explanations(self, context, pairs):
+        """Generate explanations for (answer, question) pairs with a single padded batch"""
+        if not pairs:
+            return []
+
+        prompts = [self._explanation_prompt(context, answer, question) for answer, question in pairs]
+        outputs = self._generate_texts("explanation", prompts, self._explanation_generation_settings())
+        return [texts[0] for texts in outputs]
 
     def get_wordnet_distractors(self, answer):
         """Get distractors from WordNet synonyms, hypernyms, and hyponyms"""
@@ -340,16 +693,17 @@ class MCQGenerator:
 
         return distractors
 
-    def generate_distractors(self, answer, context, question, num_distractors=3):
+    def generate_distractors(self, answer, context, question, num_distractors=3, analysis=None):
         all_distractors = []
 
         # Method 1: Sense2Vec
         try:
             answer_tokens = answer.lower().split()
             if len(answer_tokens) == 1:
-                sense = self.s2v.get_best_sense(answer)
+                with span("model.sense2vec"):
+                    sense = self.s2v.get_best_sense(answer)
+                    most_similar = self.s2v.most_similar(sense, n=10) if sense else None
                 if sense:
-                    most_similar = self.s2v.most_similar(sense, n=10)
                     s2v_distractors = [word[0].split("|")[0] for word in most_similar]
                     all_distractors.extend(s2v_distractors)
             else:
@@ -357,57 +711,76 @@ class MCQGenerator:
                 for token in answer_tokens:
                     if token not in self.stop_words and len(token) > 3:
                         try:
-                            sense = self.s2v.get_best_sense(token)
+                            with span("model.sense2vec"):
+                                sense = self.s2v.get_best_sense(token)
+                                most_similar = self.s2v.most_similar(sense, n=5) if sense else None
                             if sense:
-                                most_similar = self.s2v.most_similar(sense, n=5)
                                 s2v_distractors = [word[0].split("|")[0] for word in most_similar]
                                 all_distractors.extend(s2v_distractors)
-                        except:
+                        except Exception as e:
+                            logger.warning(f"Sense2Vec lookup failed for '{token}': {e}")
+                            count_failure("distractors.sense2vec")
                             continue
         except Exception as e:
-            print(f"Sense2Vec error: {e}")
+            logger.warning(f"Sense2Vec lookup failed for '{answer}': {e}")
+            count_failure("distractors.sense2vec")
 
         # Method 2: WordNet
-        wordnet_distractors = self.get_wordnet_distractors(answer)
-        all_distractors.extend(wordnet_distractors)
+        if current_profile().wordnet_distractors:
+            wordnet_distractors = self.get_wordnet_distractors(answer)
+            all_distractors.extend(wordnet_distractors)
 
         # Method 3: Extract other keywords from context as distractors
-        context_keywords = self.extract_keywords(context, n=10)
+        context_keywords = self.extract_keywords(context, n=10, analysis=analysis)
         all_distractors.extend([kw for kw in context_keywords if kw.lower() != answer.lower()])
 
         # Filter distractors
-        filtered_distractors = []
-        seen = set()
-
-        # Calculate similarity between answer and distractors
-        answer_embedding = self.sentence_model.encode([answer])[0]
+        answer_lower = answer.lower()
 
+        # Skip candidates equal to the answer or overlapping it as a substring
+        candidates = []
         for distractor in all_distractors:
             distractor_lower = distractor.lower()
-
-            # Skip if already seen, too similar to answer, or is a substring of answer
-            if (distractor_lower in seen or
-                distractor_lower == answer.lower() or
-                distractor_lower in answer.lower() or
-                answer.lower() in distractor_lower):
+            if (distractor_lower == answer_lower or
+                distractor_lower in answer_lower or
+                answer_lower in distractor_lower):
                 continue
+            candidates.append(distractor)
+        unique_candidates = list(dict.fromkeys(candidates))
+
+        # Calculate similarity between answer and all distractors with one batched encode
+        answer_embedding = analysis.embedding_for(answer) if analysis is not None else None
+        if answer_embedding is None:
+            answer_embedding = self.embeddings.encode([answer])[0]
 
-            # Calculate semantic similarity
+        semantic_ok = np.ones(len(unique_candidates), dtype=bool)
+        if unique_candidates:
             try:
-                distractor_embedding = self.sentence_model.encode([distractor])[0]
-                similarity = np.dot(answer_embedding, distractor_embedding) / (
-                    np.linalg.norm(answer_embedding) * np.linalg.norm(distractor_embedding)
+                candidate_embeddings = self.embeddings.encode(unique_candidates)
+                similarities = np.dot(candidate_embeddings, answer_embedding) / (
+                    np.linalg.norm(candidate_embeddings, axis=1) * np.linalg.norm(answer_embedding)
                 )
 
                 # Skip if too similar or too dissimilar
-                if similarity > 0.85 or similarity < 0.2:
-                    continue
-            except:
-                pass
+                semantic_ok = ~((similarities > 0.85) | (similarities < 0.2))
+            except Exception as e:
+                logger.warning(f"Distractor embedding failed for '{answer}': {e}")
+                count_failure("distractors.embedding")
+
+        # Calculate normalized edit similarity, skipping candidates that are too similar
+        candidate_lowers = [c.lower() for c in unique_candidates]
+        edit_distances = np.array([Levenshtein.distance(c, answer_lower) for c in candidate_lowers], dtype=np.float64)
+        max_lengths = np.maximum(np.array([len(c) for c in candidate_lowers], dtype=np.float64), len(answer_lower))
+        edit_similarities = 1.0 - edit_distances / np.maximum(max_lengths, 1.0)
+        string_ok = edit_similarities <= 0.7
 
-            # Calculate string similarity
-            levenshtein_sim = self.normalized_levenshtein.similarity(distractor_lower, answer.lower())
-            if levenshtein_sim > 0.7:  # Too similar
+        accepted = dict(zip(unique_candidates, semantic_ok & string_ok))
+
+        filtered_distractors = []
+        seen = set()
+        for distractor in candidates:
+            distractor_lower = distractor.lower()
+            if distractor_lower in seen or not accepted[distractor]:
                 continue
 
             seen.add(distractor_lower)
@@ -427,7 +800,7 @@ class MCQGenerator:
             filtered_distractors.extend(backup_distractors)
 
         # Randomize the distractor selection further
-        random.shuffle(filtered_distractors)
+        chunk_random("distractors", answer).shuffle(filtered_distractors)
 
         # Select the final distractors - prioritize those most similar to answer in length
         answer_len = len(answer)
@@ -437,79 +810,631 @@ class MCQGenerator:
 
     def process_chunk(self, chunk, num_questions=5):
         """Process a single text chunk and generate MCQs"""
+        return self.process_chunk_result(chunk, num_questions)["mcqs"]
+
+    def process_chunk_result(self, chunk, num_questions=5, lazy_explanations=False, keyword_mode=None, dedup=None,
+                             seed=None, chunk_index=0, profile=None, deadline=None):
+        """Process a single text chunk, returning its summary, keywords, MCQs and telemetry.
+
+        telemetry holds the chunk's stage and model-call spans and caught failures; the
+        caller records it (see _record_telemetry), since this may run in a worker process.
+        With lazy_explanations the MCQs carry an explanation_handle for explain() instead
+        of an explanation. keyword_mode picks the keyword extractor (the generator's
+        default if None). dedup is the DedupIndex of answers and questions used by earlier
+        chunks of the document; near-duplicates of them are skipped before generation.
+        With a seed, every random choice derives from the seed, chunk_index and the
+        keyword it is for, so the same chunk gives the same result (see seeding.py).
+        profile names the decoding settings and distractor sources (the generator's
+        default if None); its keyword mode and lazy explanations are applied by the caller.
+        Once the Deadline passes, no more distractors or explanations are generated: the
+        MCQs finished so far are returned, unexplained ones with explanation handles,
+        and deadline_reached is set in the result. failed is set if a question or
+        explanation batch failed, leaving the chunk without MCQs.
+        """
+        with collect_telemetry() as telemetry, seeded_chunk(seed, chunk_index), \
+                use_profile(get_profile(profile or self.profile)):
+            result = self._process_chunk(chunk, num_questions, lazy_explanations, keyword_mode, dedup, deadline)
+        if deadline is not None and deadline.reached:
+            result["deadline_reached"] = True
+        result["telemetry"] = telemetry
+        return result
+
+    def _process_chunk(self, chunk, num_questions, lazy_explanations=False, keyword_mode=None, dedup=None,
+                       deadline=None):
         chunk = chunk.strip().replace("\n", " ")
-        summary = self.generate_summary(chunk)
+        with span("summary"):
+            summary = self.generate_summary(chunk)
         print(f"Generated summary: {summary[:100]}...")
 
-        keywords = self.extract_keywords(summary)
+        with span("keywords"):
+            analysis = self.analyze_text(summary, keyword_mode=keyword_mode)
+            keywords = self.extract_keywords(summary, analysis=analysis)
         print(f"Extracted keywords: {', '.join(keywords[:5])}...")
 
+        result = {"summary": summary, "keywords": list(keywords), "mcqs": []}
+
+        if dedup is not None:
+            # Answers and questions picked in this chunk count as used too
+            dedup = dedup.copy()
+            keywords = self._unused_answers(keywords, analysis, dedup)
+
         # Shuffle keywords for randomization
-        random.shuffle(keywords)
+        chunk_random("keywords").shuffle(keywords)
+
+        summary_key = summary_id(summary) if lazy_explanations else None
+        if self.batch_generation:
+            mcqs = self._generate_mcqs_batched(summary, keywords, analysis, num_questions, summary_key, dedup,
+                                               deadline)
+            if mcqs is None:
+                # The failure is already in the telemetry; failed keeps the empty result out of the cache
+                result["failed"] = True
+                mcqs = []
+            result["mcqs"] = mcqs
+            return result
 
         mcqs = []
         for keyword in keywords:
             try:
-                question = self.generate_question(summary, keyword)
+                with span("questions"):
+                    question = self.generate_question(summary, keyword, analysis=analysis)
                 if not question or len(question) < 10:
                     continue
+                question_embedding = self._new_question_embedding(question, dedup)
+                if dedup is not None and question_embedding is None:
+                    continue
 
-                distractors = self.generate_distractors(keyword, summary, question)
+                if deadline is not None and deadline.passed():
+                    break
+                with span("distractors"):
+                    distractors = self.generate_distractors(keyword, summary, question, analysis=analysis)
                 if len(distractors) < 3:
                     continue
+                if dedup is not None:
+                    dedup.add(keyword, question_embedding=question_embedding)
+
+                if summary_key is None and deadline is not None and deadline.passed():
+                    # Out of time: the explanation is left for explain()
+                    summary_key = summary_id(summary)
+                if summary_key is not None:
+                    mcqs.append(self._build_mcq(question, keyword, distractors, None, summary_key))
+                else:
+                    with span("explanations"):
+                        explanation = self.generate_explanation(summary, keyword, question)
+                    mcqs.append(self._build_mcq(question, keyword, distractors, explanation))
+
+                if len(mcqs) >= num_questions:
+                    break
+            except Exception as e:
+                print(f"Error generating MCQ for keyword '{keyword}': {e}")
+                count_failure("mcq")
+                continue
 
-                explanation = self.generate_explanation(summary, keyword, question)
+        result["mcqs"] = mcqs
+        return result
 
-                # Shuffle options
-                options = [keyword] + distractors[:3]
-                random.shuffle(options)
+    def _generate_mcqs_batched(self, summary, keywords, analysis, num_questions, summary_key=None, dedup=None,
+                               deadline=None):
+        """Generate all questions of a chunk in one batch, then explain the survivors in another.
 
-                # Find correct answer index
-                correct_index = options.index(keyword)
+        With a summary_key, explanations are left for explain() and the MCQs get handles instead.
+        Questions repeating one in dedup are dropped before distractors and explanations.
+        Past the deadline, no more distractors are looked up and explanations are left
+        for explain(). None if the question or explanation batch failed.
+        """
+        try:
+            with span("questions"):
+                questions = self.generate_questions(summary, keywords, analysis=analysis)
+        except Exception as e:
+            print(f"Error generating questions for chunk: {e}")
+            count_failure("questions")
+            return None
 
-                mcqs.append({
-                    "question": question,
-                    "answer": keyword,
-                    "options": options,
-                    "correct_index": correct_index,
-                    "explanation": explanation
-                })
+        drafts = []
+        for keyword, question in zip(keywords, questions):
+            try:
+                if not question or len(question) < 10:
+                    continue
+                question_embedding = self._new_question_embedding(question, dedup)
+                if dedup is not None and question_embedding is None:
+                    continue
 
-                if len(mcqs) >= num_questions:
+                if deadline is not None and deadline.passed():
+                    break
+                with span("distractors"):
+                    distractors = self.generate_distractors(keyword, summary, question, analysis=analysis)
+                if len(distractors) < 3:
+                    continue
+                if dedup is not None:
+                    dedup.add(keyword, question_embedding=question_embedding)
+
+                drafts.append((question, keyword, distractors))
+                if len(drafts) >= num_questions:
                     break
             except Exception as e:
                 print(f"Error generating MCQ for keyword '{keyword}': {e}")
+                count_failure("mcq")
                 continue
 
-        return mcqs
+        if summary_key is None and deadline is not None and deadline.passed():
+            summary_key = summary_id(summary)
+        if summary_key is not None:
+            return [self._build_mcq(question, keyword, distractors, None, summary_key)
+                    for question, keyword, distractors in drafts]
 
-    def process_pdf(self, pdf_path, questions_per_chunk=3, chunk_size=2000, overlap=200):
-        """Process an entire PDF file, extracting text and generating MCQs from chunks"""
-        # Extract text from PDF
-        print(f"Extracting text from {pdf_path}...")
-        pdf_text = extract_text_from_pdf(pdf_path)
-        
-        if not pdf_text:
+        try:
+            with span("explanations"):
+                explanations = self.generate_explanations(summary, [(keyword, question) for question, keyword, _ in drafts])
+        except Exception as e:
+            print(f"Error generating explanations for chunk: {e}")
+            count_failure("explanations")
+            return None
+
+        return [self._build_mcq(question, keyword, distractors, explanation)
+                for (question, keyword, distractors), explanation in zip(drafts, explanations)]
+
+    def _unused_answers(self, keywords, analysis, dedup):
+        """Keywords that do not repeat an answer used earlier in the document, or an earlier keyword"""
+        kept = []
+        for keyword in keywords:
+            embedding = analysis.embedding_for(keyword)
+            if dedup.is_duplicate_answer(keyword, embedding):
+                continue
+            dedup.add(keyword, answer_embedding=embedding)
+            kept.append(keyword)
+        # Each skipped keyword is a question generation saved
+        count_skipped("answers", len(keywords) - len(kept))
+        return kept
+
+    def _new_question_embedding(self, question, dedup):
+        """Embedding of question, or None if it repeats a question in dedup (or there is no dedup)"""
+        if dedup is None:
+            return None
+        embedding = self.embeddings.encode([question])[0]
+        if dedup.is_duplicate_question(embedding):
+            count_skipped("questions")
+            return None
+        return embedding
+
+    def _dedup_mcqs(self, mcqs, dedup):
+        """Drop MCQs repeating an answer or question already used in the document, and record the rest.
+
+        Catches repeats between chunks that were generated at the same time in workers,
+        and in chunks served from the result cache.
+        """
+        kept = []
+        for mcq in mcqs:
+            answer_embedding, question_embedding = self.embeddings.encode([mcq["answer"], mcq["question"]])
+            if dedup.is_duplicate_answer(mcq["answer"], answer_embedding) or dedup.is_duplicate_question(question_embedding):
+                continue
+            dedup.add(mcq["answer"], answer_embedding, question_embedding)
+            kept.append(mcq)
+        count_skipped("mcqs", len(mcqs) - len(kept))
+        return kept
+
+    def _build_mcq(self, question, answer, distractors, explanation, summary_key=None):
+        # Shuffle options
+        options = [answer] + distractors[:3]
+        chunk_random("options", answer).shuffle(options)
+
+        # Find correct answer index
+        correct_index = options.index(answer)
+
+        mcq = {
+            "question": question,
+            "answer": answer,
+            "options": options,
+            "correct_index": correct_index,
+            "explanation": explanation
+        }
+        if summary_key is not None:
+            # Everything explain() needs to generate the explanation later
+            mcq["explanation_handle"] = {"summary_id": summary_key, "question": question, "answer": answer}
+        return mcq
+
+    def explain(self, handles):
+        """Explanations for explanation handles, generating the missing ones in one batch.
+
+        Returns one {"explanation"} or {"error"} dict per handle, in order. Generated
+        explanations are stored, so each one is only generated once.
+        """
+        results = [None] * len(handles)
+        pending = []
+        for i, handle in enumerate(handles):
+            try:
+                key, question, answer = handle["summary_id"], handle["question"], handle["answer"]
+            except (KeyError, TypeError):
+                results[i] = {"error": "Handles need summary_id, question and answer"}
+                continue
+            explanation = self.explanation_store.get_explanation(key, answer, question)
+            if explanation is not None:
+                results[i] = {"explanation": explanation}
+                continue
+            summary = self.explanation_store.get_summary(key)
+            if summary is None and self.question_bank is not None:
+                # Banked MCQs outlive the bounded explanation store
+                summary = self.question_bank.summary(key)
+            if summary is None:
+                results[i] = {"error": "Unknown or expired summary_id"}
+                continue
+            pending.append((i, key, summary, answer, question))
+
+        if pending:
+            # One batch across summaries; the scheduler may merge it with other requests
+            prompts = [self._explanation_prompt(summary, answer, question)
+                       for _, _, summary, answer, question in pending]
+            with span("explanations"):
+                outputs = self._generate_texts("explanation", prompts, self._explanation_generation_settings())
+            for (i, key, _, answer, question), texts in zip(pending, outputs):
+                self.explanation_store.put_explanation(key, answer, question, texts[0])
+                if self.question_bank is not None:
+                    self.question_bank.put_explanation(key, question, texts[0])
+                results[i] = {"explanation": texts[0]}
+        return results
+
+    def _cache_params(self, questions_per_chunk, lazy_explanations=False, keyword_mode=None, seed=None,
+                      profile="quality"):
+        """Generation parameters that change a chunk's result, used in result cache keys"""
+        params = {
+            "questions_per_chunk": questions_per_chunk,
+            "models": self.models.fingerprint(),
+            "batch_generation": self.batch_generation
+        }
+        # Only added when set, so entries cached before lazy explanations existed stay valid
+        if lazy_explanations:
+            params["lazy_explanations"] = True
+        if (keyword_mode or self.keyword_mode) != "quality":
+            params["keyword_mode"] = keyword_mode or self.keyword_mode
+        if seed is not None:
+            params["seed"] = seed
+        if profile != "quality":
+            params["profile"] = profile
+        return params
+
+    def _record_span(self, name, seconds, timer=None):
+        """Add a span to the generator's timer, the metrics and an optional per-request timer"""
+        self.timer.add(name, seconds)
+        STAGE_SECONDS.observe(seconds, stage=name)
+        if timer is not None:
+            timer.add(name, seconds)
+
+    def _record_telemetry(self, telemetry, timer=None):
+        """Record the spans and failures a chunk collected, possibly in a worker process"""
+        for name, seconds in telemetry["spans"]:
+            self._record_span(name, seconds, timer)
+        for stage, count in telemetry["failures"].items():
+            FAILURES.inc(count, stage=stage)
+        for stage, count in telemetry["skipped"].items():
+            DEDUP_SKIPPED.inc(count, stage=stage)
+
+    def _iter_chunk_results(self, chunks, questions_per_chunk, lazy_explanations=False, keyword_mode=None,
+                            parallel=True, dedup=None, seed=None, profile=None, deadline=None):
+        """Yield (chunk_index, chunk_result) in order; chunk_result is None if the chunk failed.
+
+        chunks may be any iterable; None entries are skipped and yield (index, None).
+        Each chunk sees dedup as it is when the chunk starts. Chunks still running in
+        workers when the deadline passes are abandoned; a chunk running in this process
+        is finished.
+        """
+        if self.chunk_pool is not None and parallel:
+            yield from self.chunk_pool.imap(chunks, questions_per_chunk, lazy_explanations, keyword_mode, dedup, seed,
+                                            profile, deadline)
+            return
+
+        for i, chunk in enumerate(chunks):
+            if chunk is None:
+                yield i, None
+                continue
+            print(f"\nProcessing chunk {i+1}...")
+            try:
+                result = self.process_chunk_result(chunk, num_questions=questions_per_chunk,
+                                                   lazy_explanations=lazy_explanations, keyword_mode=keyword_mode,
+                                                   dedup=dedup, seed=seed, chunk_index=i, profile=profile,
+                                                   deadline=deadline)
+            except Exception as e:
+                # One bad chunk should not lose the rest of the document
+                print(f"Error processing chunk {i+1}: {e}")
+                result = None
+            yield i, result
+
+    def iter_chunks(self, chunks, questions_per_chunk=3, timer=None, lazy_explanations=False, keyword_mode=None,
+                    document_key=None, seed=None, profile=None, deadline=None):
+        """Process chunks in order, yielding (chunk_index, total_chunks, chunk_mcqs) as each one finishes.
+
+        chunks may be a list or an iterator that is still producing chunks, such as the
+        chunks of a PDF being extracted; total_chunks is None for iterators.
+        Chunks already in the result cache are served from it; only the others are generated.
+        Stage timings are also added to timer, if given. With lazy_explanations the chunk
+        summaries are kept in the explanation store for explain(). keyword_mode picks
+        the keyword extractor for the generated chunks. Unless dedup_threshold is 0,
+        answers and questions repeating earlier ones in the document are skipped.
+        With a document_key and a question bank, every chunk's MCQs are stored in the
+        bank, and the document is marked complete once all chunks succeeded.
+        With a seed, each chunk's result depends only on the seed, its index and its
+        text, and is cached under all three.
+        profile picks a speed/quality profile (the generator's default if None); fast
+        implies lazy explanations and, unless keyword_mode is given, fast keywords.
+        With a Deadline, no chunk or chunk step is started once it has passed and the
+        MCQs finished so far are all that is yielded; deadline.reached is then set.
+        Cut-short chunks are not cached.
+        """
+        profile = get_profile(profile or self.profile)
+        lazy_explanations = lazy_explanations or profile.lazy_explanations
+        keyword_mode = keyword_mode or profile.keyword_mode
+        # Fail on an unknown mode before any chunk is generated
+        self._keyword_extractor(keyword_mode)
+        total = len(chunks) if isinstance(chunks, (list, tuple)) else None
+        params = self._cache_params(questions_per_chunk, lazy_explanations, keyword_mode, seed, profile.name)
+        # (cache key, cached MCQs and summary or None) of each chunk read but not yet yielded
+        slots = deque()
+        lookups = {"seconds": 0.0, "hits": 0}
+        dedup = DedupIndex(self.dedup_threshold) if self.dedup_threshold else None
+        # What a worker sees of earlier chunks depends on timing, so seeded chunks start from
+        # an empty index; repeats across chunks are still dropped in order by _dedup_mcqs
+        chunk_dedup = DedupIndex(self.dedup_threshold) if dedup is not None and seed is not None else dedup
+        bank = self.question_bank if document_key else None
+        done = 0
+        failed = 0
+
+        def pending():
+            # Cached chunks are passed on as None so the results stay in document order
+            for i, chunk in enumerate(chunks):
+                if deadline is not None and deadline.expired():
+                    deadline.reached = True
+                    return
+                key = entry = None
+                if self.result_cache is not None:
+                    start = time.perf_counter()
+                    key = self.result_cache.make_key(chunk, params if seed is None else dict(params, chunk_index=i))
+                    entry = self.result_cache.get(key)
+                    lookups["seconds"] += time.perf_counter() - start
+                if entry is None:
+                    slots.append((key, None, None))
+                    yield chunk
+                    continue
+                lookups["hits"] += 1
+                if lazy_explanations:
+                    self.explanation_store.put_summary(entry["summary"])
+                slots.append((key, entry["mcqs"], entry["summary"]))
+                yield None
+
+        try:
+            # A single known chunk is not worth a round trip through the worker pool
+            parallel = total is None or total > 1
+            for i, result in self._iter_chunk_results(pending(), questions_per_chunk, lazy_explanations,
+                                                      keyword_mode, parallel, chunk_dedup, seed, profile.name,
+                                                      deadline):
+                key, cached, entry_summary = slots.popleft()
+                done = i + 1
+                if cached is not None:
+                    CHUNKS.inc(source="cache")
+                    if dedup is not None:
+                        cached = self._dedup_mcqs(cached, dedup)
+                    MCQS.inc(len(cached))
+                    if bank is not None and not self._bank_mcqs(bank, document_key, i, cached, entry_summary):
+                        failed += 1
+                    yield i, total, cached
+                    continue
+
+                if result is None:
+                    CHUNKS.inc(source="failed")
+                    failed += 1
+                    yield i, total, []
+                    continue
+                self._record_telemetry(result.pop("telemetry"), timer)
+                # A chunk whose question or explanation batch failed is not cached, so it is retried
+                chunk_failed = result.pop("failed", False)
+                CHUNKS.inc(source="failed" if chunk_failed else "generated")
+                # A chunk cut short by the deadline, possibly in a worker, has handles but no full result
+                cut_short = result.pop("deadline_reached", False)
+                if cut_short:
+                    deadline.reached = True
+                if lazy_explanations or cut_short:
+                    self.explanation_store.put_summary(result["summary"])
+                if key is not None and not cut_short and not chunk_failed:
+                    self.result_cache.put(key, result)
+                mcqs = result["mcqs"]
+                if dedup is not None:
+                    mcqs = self._dedup_mcqs(mcqs, dedup)
+                MCQS.inc(len(mcqs))
+                if chunk_failed:
+                    failed += 1
+                elif bank is not None and not self._bank_mcqs(bank, document_key, i, mcqs, result["summary"]):
+                    failed += 1
+                yield i, total, mcqs
+            if deadline is not None and deadline.reached:
+                print(f"Deadline of {deadline.seconds}s reached, returning the MCQs of {done} chunks")
+            elif bank is not None and not failed:
+                # A failed chunk leaves the document incomplete, so a later sample regenerates it
+                bank.mark_complete(document_key, done)
+        finally:
+            if self.result_cache is not None:
+                self._record_span("result_cache", lookups["seconds"], timer)
+                if lookups["hits"]:
+                    print(f"Served {lookups['hits']} chunks from the result cache")
+
+    def _bank_mcqs(self, bank, document_key, chunk_index, mcqs, summary=None):
+        """Store a chunk's MCQs in the question bank with their question embeddings; False if that failed"""
+        if not mcqs:
+            return True
+        try:
+            embeddings = self.embeddings.encode([mcq["question"] for mcq in mcqs])
+            bank.add(document_key, chunk_index, mcqs, embeddings, summary)
+            return True
+        except Exception as e:
+            # The quiz is still served; only the bank misses this chunk
+            logger.warning(f"Could not store chunk {chunk_index + 1} in the question bank: {e}")
+            count_failure("question_bank")
+            return False
+
+    def cache_stats(self):
+        """Hit/miss counters and sizes of the embedding and result caches, and the question bank"""
+        return {
+            "embeddings": self.embeddings.stats(),
+            "results": self.result_cache.stats() if self.result_cache is not None else None,
+            "explanations": self.explanation_store.stats(),
+            "question_bank": self.question_bank.stats() if self.question_bank is not None else None
+        }
+
+    def close(self):
+        """Stop the chunk worker processes and the inference scheduler, if any"""
+        if self.chunk_pool is not None:
+            self.chunk_pool.shutdown()
+        if self.scheduler is not None:
+            self.scheduler.stop()
+
+    def _collect_mcqs(self, chunks, questions_per_chunk, progress_callback=None, shuffle=True, timer=None,
+                      lazy_explanations=False, keyword_mode=None, document_key=None, seed=None, profile=None,
+                      deadline=None, page_progress=None):
+        """Gather the MCQs of all chunks, reporting (chunks_done, total_chunks, chunk_mcqs) after every chunk.
+
+        With the page_progress of a PDF (see _pdf_chunks), the callback also gets
+        pages=(pages_done, pages_total), which is known before the chunk count is.
+        """
+        if progress_callback:
+            progress_callback(0, len(chunks) if isinstance(chunks, (list, tuple)) else None, [])
+
+        all_mcqs = []
+        done = 0
+        for i, total, chunk_mcqs in self.iter_chunks(chunks, questions_per_chunk, timer=timer,
+                                                     lazy_explanations=lazy_explanations,
+                                                     keyword_mode=keyword_mode, document_key=document_key,
+                                                     seed=seed, profile=profile, deadline=deadline):
+            done = i + 1
+            all_mcqs.extend(chunk_mcqs)
+            if progress_callback and page_progress and page_progress.get("total") is not None:
+                progress_callback(done, total, chunk_mcqs,
+                                  pages=(page_progress["chunk_pages"][i], page_progress["total"]))
+            elif progress_callback:
+                progress_callback(done, total, chunk_mcqs)
+        if progress_callback and not isinstance(chunks, (list, tuple)):
+            # The chunk count of a streamed document is only known at the end
+            progress_callback(done, done, [])
+
+        if shuffle:
+            # Add entropy to increase randomness in the final set
+            (random if seed is None else seeded_random(seed, "shuffle")).shuffle(all_mcqs)
+
+        return all_mcqs
+
+    def _chunk_budget(self, chunk_size):
+        reserved = len(self.summary_tokenizer(SUMMARY_PREFIX, add_special_tokens=False)["input_ids"]) + 1
+        return min(chunk_size, MODEL_MAX_TOKENS), reserved
+
+    def chunk_text(self, text, chunk_size=MODEL_MAX_TOKENS, overlap=50):
+        """Split text into chunks of at most chunk_size summary-model tokens (capped at the model window)"""
+        max_tokens, reserved = self._chunk_budget(chunk_size)
+        return chunk_text_by_tokens(text, self.summary_tokenizer, max_tokens=max_tokens, overlap=overlap,
+                                    reserved_tokens=reserved)
+
+    def iter_chunk_texts(self, texts, chunk_size=MODEL_MAX_TOKENS, overlap=50):
+        """Yield chunks of a sequence of texts, such as PDF pages, as soon as each one is full"""
+        max_tokens, reserved = self._chunk_budget(chunk_size)
+        return iter_chunks_by_tokens(texts, self.summary_tokenizer, max_tokens=max_tokens, overlap=overlap,
+                                     reserved_tokens=reserved)
+
+    def _pdf_chunks(self, pdf, chunk_size=MODEL_MAX_TOKENS, overlap=50, timer=None, pages=None, page_progress=None):
+        """Yield the chunks of a PDF path or bytes while its pages are still being extracted.
+
+        pages is an optional page range spec such as "1-5,8". page_progress, if given, is
+        a dict that gets the number of pages to read under "total" and, under
+        "chunk_pages", the number of pages read by the time each chunk was cut.
+        """
+        print(f"Extracting text from {pdf if isinstance(pdf, str) else 'uploaded PDF'}...")
+        spent = {"extract": 0.0, "pages": 0, "characters": 0}
+
+        def page_texts():
+            on_page_count = None
+            if page_progress is not None:
+                page_progress["chunk_pages"] = []
+                on_page_count = lambda count: page_progress.update(total=count)
+            page_iter = iter_pdf_pages(pdf, pages=pages, workers=self.pdf_workers, on_page_count=on_page_count)
+            while True:
+                start = time.perf_counter()
+                try:
+                    _, text = next(page_iter)
+                except StopIteration:
+                    return
+                finally:
+                    spent["extract"] += time.perf_counter() - start
+                spent["pages"] += 1
+                spent["characters"] += len(text)
+                if text:
+                    yield text
+
+        # Chunking time is what the chunker takes beyond waiting for pages
+        chunking = 0.0
+        chunk_count = 0
+        chunk_iter = self.iter_chunk_texts(page_texts(), chunk_size=chunk_size, overlap=overlap)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = next(chunk_iter)
+                except StopIteration:
+                    break
+                finally:
+                    chunking += time.perf_counter() - start
+                chunk_count += 1
+                if page_progress is not None:
+                    page_progress["chunk_pages"].append(spent["pages"])
+                yield chunk
+        finally:
+            chunk_iter.close()
+            self._record_span("extract", spent["extract"], timer)
+            self._record_span("chunking", max(0.0, chunking - spent["extract"]), timer)
+
+        if not spent["characters"]:
             print("Failed to extract text from PDF or PDF is empty.")
+        else:
+            print(f"Extracted {spent['characters']} characters from {spent['pages']} pages "
+                  f"into {chunk_count} chunks.")
+
+    def _text_chunks(self, text, chunk_size=MODEL_MAX_TOKENS, overlap=50, timer=None):
+        if not text:
+            print("Empty text provided.")
             return []
             
-        print(f"Successfully extracted {len(pdf_text)} characters from PDF.")
+        print(f"Processing text with {len(text)} characters.")
         
         # Chunk the text
-        chunks = chunk_text(pdf_text, chunk_size=chunk_size, overlap=overlap)
+        start = time.perf_counter()
+        chunks = self.chunk_text(text, chunk_size=chunk_size, overlap=overlap)
+        self._record_span("chunking", time.perf_counter() - start, timer)
         print(f"Split text into {len(chunks)} chunks.")
-        
-        # Process each chunk
-        all_mcqs = []
-        for i, chunk in enumerate(chunks):
-            print(f"\nProcessing chunk {i+1}/{len(chunks)}...")
-            chunk_mcqs = self.process_chunk(chunk, num_questions=questions_per_chunk)
-            all_mcqs.extend(chunk_mcqs)
-            
-        # Add entropy to increase randomness in the final set
-        random.shuffle(all_mcqs)
-        
-        return all_mcqs
+        return chunks
+
+    def iter_pdf(self, pdf_path, questions_per_chunk=3, chunk_size=MODEL_MAX_TOKENS, overlap=50, timer=None,
+                 lazy_explanations=False, keyword_mode=None, pages=None, document_key=None, seed=None,
+                 profile=None, deadline=None):
+        """Yield (chunk_index, total_chunks, chunk_mcqs) for a PDF path or bytes as each chunk finishes.
+
+        Chunks are generated while later pages are still being extracted, so total_chunks is None.
+        """
+        chunks = self._pdf_chunks(pdf_path, chunk_size=chunk_size, overlap=overlap, timer=timer, pages=pages)
+        yield from self.iter_chunks(chunks, questions_per_chunk, timer=timer, lazy_explanations=lazy_explanations,
+                                    keyword_mode=keyword_mode, document_key=document_key, seed=seed,
+                                    profile=profile, deadline=deadline)
+
+    def iter_text(self, text, questions_per_chunk=3, chunk_size=MODEL_MAX_TOKENS, overlap=50, timer=None,
+                 lazy_explanations=False, keyword_mode=None, document_key=None, seed=None,
+                 profile=None, deadline=None):
+        """Yield (chunk_index, total_chunks, chunk_mcqs) for plain text as each chunk finishes"""
+        chunks = self._text_chunks(text, chunk_size=chunk_size, overlap=overlap, timer=timer)
+        yield from self.iter_chunks(chunks, questions_per_chunk, timer=timer, lazy_explanations=lazy_explanations,
+                                    keyword_mode=keyword_mode, document_key=document_key, seed=seed,
+                                    profile=profile, deadline=deadline)
+
+    def process_pdf(self, pdf_path, questions_per_chunk=3, chunk_size=MODEL_MAX_TOKENS, overlap=50,
+                    progress_callback=None, shuffle=True, timer=None, lazy_explanations=False, keyword_mode=None,
+                    pages=None, document_key=None, seed=None, profile=None, deadline=None):
+        """Process a PDF path or bytes, extracting text and generating MCQs from chunks"""
+        page_progress = {}
+        chunks = self._pdf_chunks(pdf_path, chunk_size=chunk_size, overlap=overlap, timer=timer, pages=pages,
+                                  page_progress=page_progress)
+        return self._collect_mcqs(chunks, questions_per_chunk, progress_callback, shuffle, timer=timer,
+                                  lazy_explanations=lazy_explanations, keyword_mode=keyword_mode,
+                                  document_key=document_key, seed=seed, profile=profile, deadline=deadline,
+                                  page_progress=page_progress)
 
     def format_output(self, mcqs):
         """Format the MCQs for display"""
@@ -524,30 +1449,16 @@ class MCQGenerator:
 
             correct_letter = chr(65 + mcq['correct_index'])
             output += f"\nCorrect Answer: {correct_letter}. {mcq['answer']}\n"
-            output += f"Explanation: {mcq['explanation']}\n"
+            if mcq['explanation']:
+                output += f"Explanation: {mcq['explanation']}\n"
 
         return output
 
-    def process_text(self, text, questions_per_chunk=3, chunk_size=2000, overlap=200):
+    def process_text(self, text, questions_per_chunk=3, chunk_size=MODEL_MAX_TOKENS, overlap=50,
+                     progress_callback=None, shuffle=True, timer=None, lazy_explanations=False, keyword_mode=None,
+                     document_key=None, seed=None, profile=None, deadline=None):
         """Process plain text and generate MCQs from chunks"""
-        if not text:
-            print("Empty text provided.")
-            return []
-            
-        print(f"Processing text with {len(text)} characters.")
-        
-        # Chunk the text
-        chunks = chunk_text(text, chunk_size=chunk_size, overlap=overlap)
-        print(f"Split text into {len(chunks)} chunks.")
-        
-        # Process each chunk
-        all_mcqs = []
-        for i, chunk in enumerate(chunks):
-            print(f"\nProcessing chunk {i+1}/{len(chunks)}...")
-            chunk_mcqs = self.process_chunk(chunk, num_questions=questions_per_chunk)
-            all_mcqs.extend(chunk_mcqs)
-            
-        # Add entropy to increase randomness in the final set
-        random.shuffle(all_mcqs)
-        
-        return all_mcqs
+        chunks = self._text_chunks(text, chunk_size=chunk_size, overlap=overlap, timer=timer)
+        return self._collect_mcqs(chunks, questions_per_chunk, progress_callback, shuffle, timer=timer,
+                                  lazy_explanations=lazy_explanations, keyword_mode=keyword_mode,
+                                  document_key=document_key, seed=seed, profile=profile, deadline=deadline)
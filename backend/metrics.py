@@ -0,0 +1,159 @@
+import threading
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Upper bounds of the scheduler batch-size histogram buckets, in prompts
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        # Unlabeled counters are exported as 0 before their first increment
+        self._values = {} if self.labelnames else {(): 0}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _format_labels(self.labelnames, key), value)
+                    for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    samples.append((self.name + "_bucket",
+                                    _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))]),
+                                    cumulative))
+                samples.append((self.name + "_bucket",
+                                _format_labels(self.labelnames, key, [("le", "+Inf")]), series["count"]))
+                samples.append((self.name + "_sum", _format_labels(self.labelnames, key), series["sum"]))
+                samples.append((self.name + "_count", _format_labels(self.labelnames, key), series["count"]))
+        return samples
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms rendered in the Prometheus text format"""
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help_text, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, collected=()):
+        """Text exposition of every metric, plus values read at scrape time.
+
+        collected holds (name, kind, help, [(labels, value)]) tuples, kind being
+        "counter" or "gauge".
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        for name, kind, help_text, values in collected:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values:
+                if value is None:
+                    continue
+                label_text = _format_labels(tuple(labels), tuple(labels.values())) if labels else ""
+                lines.append(f"{name}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "mcq_stage_seconds", "Wall time of each pipeline stage and model call", ("stage",)
+)
+FAILURES = REGISTRY.counter(
+    "mcq_failures_total", "Errors caught and skipped inside the pipeline", ("stage",)
+)
+CHUNKS = REGISTRY.counter(
+    "mcq_chunks_total", "Chunks processed, by whether they were generated, served from cache or failed", ("source",)
+)
+MCQS = REGISTRY.counter("mcq_generated_total", "MCQs returned for processed chunks")
+DEDUP_SKIPPED = REGISTRY.counter(
+    "mcq_dedup_skipped_total",
+    "Near-duplicates of earlier answers or questions in a document skipped before generation "
+    "(answers, questions) or dropped from results (mcqs)",
+    ("stage",)
+)
+SCHEDULER_BATCH_SIZE = REGISTRY.histogram(
+    "mcq_scheduler_batch_size", "Prompts per generation batch run by the inference scheduler", ("role",),
+    buckets=BATCH_SIZE_BUCKETS
+)
+REQUESTS = REGISTRY.counter(
+    "mcq_http_requests_total", "API requests by endpoint and status", ("endpoint", "status")
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "mcq_http_request_seconds", "API request latency by endpoint", ("endpoint",)
+)
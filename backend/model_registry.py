@@ -0,0 +1,190 @@
+import os
+import sys
+import time
+import hashlib
+import torch
+from s2v_table import Sense2VecTable
+
+
+def _tensors(value):
+    if isinstance(value, torch.Tensor):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _tensors(item)
+
+
+def _module_bytes(module):
+    """Bytes held by a torch module's state, counting tied tensors once.
+
+    Uses the state dict rather than parameters() so the packed weights of
+    dynamically quantized layers are included.
+    """
+    seen = set()
+    total = 0
+    for value in module.state_dict().values():
+        for tensor in _tensors(value):
+            ptr = tensor.data_ptr()
+            if ptr in seen:
+                continue
+            seen.add(ptr)
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def quantize_dynamic_int8(model):
+    """Replace the Linear layers of a model with dynamically quantized int8 versions"""
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _estimate_bytes(obj):
+    if isinstance(obj, torch.nn.Module):
+        return _module_bytes(obj)
+    # sense2vec is only imported when the raw vectors are loaded instead of the table
+    sense2vec = sys.modules.get("sense2vec")
+    if sense2vec is not None and isinstance(obj, sense2vec.Sense2Vec):
+        return obj.vectors.data.nbytes
+    if isinstance(obj, Sense2VecTable):
+        # Mapped pages are shared by every process using the table
+        return obj.mapped_bytes()
+    # Tokenizers are small compared to the weights
+    return None
+
+
+class ModelRegistry:
+    """Load each distinct checkpoint once and hand the same instance to every role that uses it.
+
+    With quantize="int8" the T5 models and the sentence encoder are loaded with their
+    Linear layers dynamically quantized to int8 (CPU only). With local_files_only the
+    Hugging Face loaders never try the network. Models found in snapshot (a
+    ModelSnapshot) are memory-mapped from it instead of loaded from their checkpoints.
+    """
+    def __init__(self, device, quantize=None, local_files_only=False, snapshot=None):
+        self.device = device
+        self.snapshot = snapshot
+        self.quantize = quantize
+        self.local_files_only = local_files_only
+        if quantize not in (None, "int8"):
+            raise ValueError(f"Unsupported quantization mode: {quantize}")
+        if quantize and device.type != "cpu":
+            print("Dynamic int8 quantization only runs on CPU, loading fp32 models instead")
+            self.quantize = None
+        self._instances = {}
+        self._roles = {}
+        self._load_seconds = {}
+        self._mapped = set()
+
+    def _maybe_quantize(self, model):
+        if self.quantize == "int8":
+            return quantize_dynamic_int8(model)
+        return model
+
+    def _get(self, kind, path, role, loader):
+        key = (kind, os.path.normpath(path))
+        if key not in self._instances:
+            print(f"Loading {kind} from {path}...")
+            start = time.perf_counter()
+            self._instances[key] = loader(path)
+            self._load_seconds[key] = time.perf_counter() - start
+        roles = self._roles.setdefault(key, [])
+        if role not in roles:
+            roles.append(role)
+        return self._instances[key]
+
+    def _load_snapshot(self, path):
+        if self.snapshot is None:
+            return None
+        model = self.snapshot.load(path)
+        if model is None:
+            return None
+        if self.quantize:
+            # Quantized layers are new private tensors, so the mapping is not shared
+            return self._maybe_quantize(model.to(self.device))
+        if self.device.type == "cpu":
+            self._mapped.add(os.path.normpath(path))
+        return model.to(self.device)
+
+    def _load_t5_model(self, path):
+        from transformers import T5ForConditionalGeneration
+
+        model = self._load_snapshot(path)
+        if model is not None:
+            return model
+        model = T5ForConditionalGeneration.from_pretrained(path, local_files_only=self.local_files_only)
+        return self._maybe_quantize(model.to(self.device))
+
+    def _load_t5_tokenizer(self, path):
+        from transformers import T5Tokenizer
+
+        return T5Tokenizer.from_pretrained(path, local_files_only=self.local_files_only)
+
+    def _load_sentence_model(self, path):
+        from sentence_transformers import SentenceTransformer
+
+        model = self._load_snapshot(path)
+        if model is not None:
+            return model
+        return self._maybe_quantize(SentenceTransformer(path, device=str(self.device)))
+
+    def _load_sense2vec(self, path):
+        from sense2vec import Sense2Vec
+
+        return Sense2Vec().from_disk(path)
+
+    def t5_model(self, path, role):
+        return self._get("t5_model", path, role, self._load_t5_model)
+
+    def t5_tokenizer(self, path, role):
+        return self._get("t5_tokenizer", path, role, self._load_t5_tokenizer)
+
+    def sentence_model(self, path, role):
+        return self._get("sentence_model", path, role, self._load_sentence_model)
+
+    def sense2vec(self, path, role):
+        return self._get("sense2vec", path, role, self._load_sense2vec)
+
+    def sense2vec_table(self, path, role):
+        return self._get("sense2vec_table", path, role, Sense2VecTable)
+
+    def fingerprint(self):
+        """Short hash of the loaded checkpoints' files, so cached results are tied to model versions"""
+        digest = hashlib.sha256()
+        digest.update(f"quantize:{self.quantize}".encode("utf-8"))
+        for kind, path in sorted(self._instances):
+            digest.update(f"{kind}:{path}".encode("utf-8"))
+            if os.path.isdir(path):
+                for name in sorted(os.listdir(path)):
+                    stat = os.stat(os.path.join(path, name))
+                    digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        return digest.hexdigest()[:16]
+
+    def load_report(self):
+        """Seconds spent loading each checkpoint"""
+        return [
+            {"kind": kind, "path": path, "seconds": round(seconds, 3)}
+            for (kind, path), seconds in self._load_seconds.items()
+        ]
+
+    def memory_report(self):
+        """Per-instance resident size of the loaded models and the roles sharing each one"""
+        entries = []
+        total = 0
+        for (kind, path), instance in self._instances.items():
+            size = _estimate_bytes(instance)
+            if size is not None:
+                total += size
+            entries.append({
+                "kind": kind,
+                "path": path,
+                "roles": list(self._roles.get((kind, path), [])),
+                # Memory-mapped from the snapshot and shared with other processes on the host
+                "mapped": path in self._mapped,
+                "bytes": size,
+                "mb": round(size / (1024 * 1024), 1) if size is not None else None
+            })
+        return {
+            "models": entries,
+            "total_bytes": total,
+            "total_mb": round(total / (1024 * 1024), 1)
+        }
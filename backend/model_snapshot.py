@@ -0,0 +1,175 @@
+"""Fast-load snapshot of the models, with weights memory-mapped instead of read into private memory.
+
+Build it once from the downloaded models:
+
+    python model_snapshot.py --models-dir models --output models/snapshot
+
+Each T5 model and the sentence encoder is serialized whole with torch.save, so
+loading it is a torch.load(mmap=True) that maps the weight storages straight from
+the file. No checkpoint parsing or weight copying is needed. The pages come from the
+page cache, so every worker process on the host shares one physical copy. The
+spaCy pipeline is saved with nlp.to_disk, and the Sense2Vec neighbour table
+(s2v_table.py) is built if it is missing.
+
+Snapshots are tied to the library versions that wrote them and to the source
+checkpoint files. MCQGenerator falls back to the regular loaders for any entry
+that does not match.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import torch
+
+# Checkpoint directories under models/ and how to load them for the snapshot
+SNAPSHOT_MODELS = {
+    "t5-base": "t5_model",
+    "t5_squad_v1": "t5_model",
+    "msmarco-distilbert-base-v3": "sentence_model"
+}
+SPACY_MODEL = "en_core_web_sm"
+
+
+def directory_fingerprint(path):
+    """Names, sizes and modification times of the files in a checkpoint directory"""
+    entries = []
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                stat = os.stat(os.path.join(root, name))
+                entries.append(f"{os.path.relpath(os.path.join(root, name), path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return sorted(entries)
+
+
+def library_versions():
+    import transformers
+    import sentence_transformers
+
+    return {
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "sentence_transformers": sentence_transformers.__version__
+    }
+
+
+def snapshot_exists(path):
+    return os.path.exists(os.path.join(path, "meta.json"))
+
+
+class ModelSnapshot:
+    """Loads models from a snapshot directory written by build_snapshot"""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self._versions_ok = None
+
+    def _compatible(self):
+        if self._versions_ok is None:
+            current = library_versions()
+            self._versions_ok = self.meta.get("versions") == current
+            if not self._versions_ok:
+                print(f"Model snapshot in {self.path} was built with {self.meta.get('versions')}, "
+                      f"running {current}; loading the original checkpoints instead")
+        return self._versions_ok
+
+    def load(self, source_path):
+        """Memory-map the snapshot of a checkpoint directory, or return None if there is no usable one"""
+        name = os.path.basename(os.path.normpath(source_path))
+        entry = self.meta.get("models", {}).get(name)
+        if entry is None or not self._compatible():
+            return None
+        if entry["fingerprint"] != directory_fingerprint(source_path):
+            print(f"Model snapshot of {name} is older than {source_path}, loading the checkpoint instead")
+            return None
+        try:
+            model = torch.load(os.path.join(self.path, entry["file"]), map_location="cpu",
+                               mmap=True, weights_only=False)
+        except TypeError:
+            # torch < 2.1 has no mmap loading
+            print("This torch version cannot memory-map snapshots, loading the checkpoints instead")
+            self._versions_ok = False
+            return None
+        model.eval()
+        return model
+
+    def spacy_path(self):
+        """Directory of the saved spaCy pipeline, if the snapshot has a usable one"""
+        entry = self.meta.get("spacy")
+        if entry is None:
+            return None
+        import spacy
+
+        if entry["version"] != spacy.__version__:
+            return None
+        path = os.path.join(self.path, entry["path"])
+        return path if os.path.isdir(path) else None
+
+
+def build_snapshot(models_dir, output, s2v_top_k=10):
+    """Serialize every model under models_dir into a memory-mappable snapshot in output"""
+    from transformers import T5ForConditionalGeneration
+    from sentence_transformers import SentenceTransformer
+
+    start = time.time()
+    os.makedirs(output, exist_ok=True)
+    # Written again at the end, so a rebuild interrupted halfway is never picked up
+    if snapshot_exists(output):
+        os.remove(os.path.join(output, "meta.json"))
+    meta = {"versions": library_versions(), "models": {}}
+
+    for name, kind in SNAPSHOT_MODELS.items():
+        source = os.path.join(models_dir, name)
+        if not os.path.isdir(source):
+            print(f"Skipping {name}: {source} not found")
+            continue
+        print(f"Snapshotting {name}...")
+        if kind == "t5_model":
+            model = T5ForConditionalGeneration.from_pretrained(source)
+        else:
+            model = SentenceTransformer(source, device="cpu")
+        model.eval()
+        filename = f"{name}.pt"
+        torch.save(model, os.path.join(output, filename))
+        meta["models"][name] = {"kind": kind, "file": filename, "fingerprint": directory_fingerprint(source)}
+        del model
+
+    try:
+        import spacy
+
+        print(f"Saving spaCy pipeline {SPACY_MODEL}...")
+        spacy.load(SPACY_MODEL).to_disk(os.path.join(output, "spacy", SPACY_MODEL))
+        meta["spacy"] = {"path": os.path.join("spacy", SPACY_MODEL), "version": spacy.__version__}
+    except OSError as e:
+        print(f"Skipping spaCy pipeline: {e}")
+
+    # Sense2Vec is served from its own memory-mapped neighbour table
+    from s2v_table import table_exists, build_table
+
+    s2v_source = os.path.join(models_dir, "s2v_old")
+    s2v_table = os.path.join(models_dir, "s2v_table")
+    if not table_exists(s2v_table) and os.path.exists(s2v_source):
+        build_table(s2v_source, s2v_table, top_k=s2v_top_k)
+
+    with open(os.path.join(output, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    print(f"Model snapshot written to {output} in {time.time() - start:.0f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a memory-mapped fast-load snapshot of the models")
+    parser.add_argument("--models-dir", default="models", help="Directory with the downloaded models")
+    parser.add_argument("--output", default="models/snapshot", help="Directory to write the snapshot to")
+    parser.add_argument("--s2v-top-k", type=int, default=10, help="Neighbours per key if the Sense2Vec table is built")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.models_dir):
+        print(f"Models directory not found: {args.models_dir}")
+        return 1
+    build_snapshot(args.models_dir, args.output, s2v_top_k=args.s2v_top_k)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Pages per task handed to an extraction worker
+PAGES_PER_TASK = 8
+
+# Set in each extraction worker by the pool initializer; with fork the document
+# bytes are inherited, not pickled
+_worker_source = None
+
+
+def parse_page_range(spec):
+    """Parse a 1-based page range spec such as "1-5,8,10-" into (first, last) pairs.
+
+    last is None for open ranges. Raises ValueError on malformed specs.
+    """
+    ranges = []
+    for part in spec.replace(" ", "").split(","):
+        if not part:
+            continue
+        first, dash, last = part.partition("-")
+        try:
+            first = int(first) if first else 1
+            last = (int(last) if last else None) if dash else first
+        except ValueError:
+            raise ValueError(f"Invalid page range '{part}'")
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"Invalid page range '{part}'")
+        ranges.append((first, last))
+    if not ranges:
+        raise ValueError("Empty page range")
+    return ranges
+
+
+def select_pages(ranges, page_count):
+    """Sorted 0-based page indices covered by parsed ranges, within page_count"""
+    indices = set()
+    for first, last in ranges:
+        last = page_count if last is None else min(last, page_count)
+        indices.update(range(first - 1, last))
+    if not indices:
+        raise ValueError(f"The page range selects none of the document's {page_count} pages")
+    return sorted(indices)
+
+
+def open_pdf(source):
+    """Open a PDF from a path or from the bytes of an upload, without writing it to disk"""
+    import pdfplumber
+
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    return pdfplumber.open(source)
+
+
+def page_count(source):
+    """Number of pages of a PDF path or bytes"""
+    with open_pdf(source) as pdf:
+        return len(pdf.pages)
+
+
+def _page_text(pdf, index):
+    page = pdf.pages[index]
+    try:
+        return page.extract_text() or ""
+    except Exception as e:
+        print(f"Error extracting text from page {index + 1}: {e}")
+        return ""
+    finally:
+        # Drop the page's parsed layout objects once its text is out
+        page.flush_cache()
+
+
+def extract_pages(source, indices):
+    """Text of the given 0-based pages, in order"""
+    with open_pdf(source) as pdf:
+        return [_page_text(pdf, index) for index in indices]
+
+
+def _init_worker(source):
+    global _worker_source
+    _worker_source = source
+
+
+def _extract_task(indices):
+    return extract_pages(_worker_source, indices)
+
+
+def iter_pdf_pages(source, pages=None, workers=0, on_page_count=None):
+    """Yield (page_index, text) for a PDF path or bytes, in page order.
+
+    pages is a range spec (see parse_page_range) limiting the pages read.
+    on_page_count, if given, is called with the number of pages to be read before
+    the first one is extracted. With
+    workers > 1, runs of PAGES_PER_TASK pages are extracted in forked processes and
+    yielded as soon as they and every earlier run are done, so the caller can chunk
+    and generate from the first pages while later ones are still being extracted.
+    """
+    ranges = parse_page_range(pages) if pages else [(1, None)]
+    with open_pdf(source) as pdf:
+        indices = select_pages(ranges, len(pdf.pages))
+        if on_page_count is not None:
+            on_page_count(len(indices))
+        tasks = [indices[i:i + PAGES_PER_TASK] for i in range(0, len(indices), PAGES_PER_TASK)]
+        if workers <= 1 or len(tasks) < 2 or "fork" not in multiprocessing.get_all_start_methods():
+            for index in indices:
+                yield index, _page_text(pdf, index)
+            return
+
+    executor = ProcessPoolExecutor(
+        max_workers=min(workers, len(tasks)),
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=_init_worker,
+        initargs=(source,)
+    )
+    futures = [executor.submit(_extract_task, task) for task in tasks]
+    try:
+        for task, future in zip(tasks, futures):
+            for index, text in zip(task, future.result()):
+                yield index, text
+    finally:
+        # Also reached when the consumer stops early, e.g. a client disconnecting mid-stream
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def extract_text_from_pdf(source, pages=None, workers=0):
+    """Extract the text of a PDF path or bytes as one string"""
+    try:
+        return "\n".join(text for _, text in iter_pdf_pages(source, pages, workers) if text).strip()
+    except Exception as e:
+        print(f"Error extracting text from PDF: {e}")
+        return ""
@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from dedup_index import normalize_answer
+
+
+def document_key(content, pages=None):
+    """Stable id of an uploaded document (PDF bytes or text), and of the page range read from it"""
+    if isinstance(content, str):
+        content = " ".join(content.split()).encode("utf-8")
+    digest = hashlib.sha256(bytes(content))
+    if pages:
+        digest.update(b"\0pages=" + pages.replace(" ", "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+class QuestionBank:
+    """SQLite bank of every MCQ generated per document, for serving quizzes without the models.
+
+    Questions are indexed by document key, chunk and normalized answer and stored with
+    their question embedding, so samples can be filtered by topic. The seen table
+    records which questions each user has been served. A document is marked complete
+    once all of its chunks have been generated. Lazily explained MCQs keep the chunk
+    summary behind their explanation handle in the summaries table, so they can be
+    explained however long they stay banked; the row is updated once they are.
+    """
+    def __init__(self, path, topic_threshold=0.4):
+        self.path = path
+        # Cosine similarity between a topic and a question embedding for the question to match it
+        self.topic_threshold = topic_threshold
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    key TEXT PRIMARY KEY,
+                    chunks INTEGER,
+                    complete INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS questions (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    document TEXT NOT NULL,
+                    chunk INTEGER NOT NULL,
+                    answer TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    mcq TEXT NOT NULL,
+                    embedding BLOB,
+                    created_at REAL NOT NULL,
+                    summary_id TEXT,
+                    UNIQUE (document, question)
+                )
+            """)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(questions)")}
+            if "summary_id" not in columns:
+                # Banks created before lazily explained MCQs were tracked
+                self._conn.execute("ALTER TABLE questions ADD COLUMN summary_id TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_summary ON questions(summary_id, question)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    id TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_answer ON questions(document, answer)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_chunk ON questions(document, chunk)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS seen (
+                    user_id TEXT NOT NULL,
+                    question_id INTEGER NOT NULL,
+                    seen_at REAL NOT NULL,
+                    PRIMARY KEY (user_id, question_id)
+                )
+            """)
+            self._conn.commit()
+
+    def add(self, document, chunk, mcqs, embeddings=None, summary=None):
+        """Store the MCQs of one chunk.
+
+        Questions already in the bank for the document are skipped, unless the banked
+        one is still waiting for its explanation and the new one has it. summary is
+        the chunk summary behind the explanation handles of lazily explained MCQs.
+        """
+        if not mcqs:
+            return
+        now = time.time()
+        rows = []
+        summary_ids = set()
+        for i, mcq in enumerate(mcqs):
+            embedding = None
+            if embeddings is not None:
+                embedding = np.asarray(embeddings[i], dtype=np.float32).tobytes()
+            handle = mcq.get("explanation_handle")
+            key = handle["summary_id"] if handle else None
+            if key is not None:
+                summary_ids.add(key)
+            rows.append((document, chunk, normalize_answer(mcq["answer"]), mcq["question"],
+                         json.dumps(mcq), embedding, now, key))
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO documents (key, updated_at) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET updated_at = excluded.updated_at",
+                (document, now)
+            )
+            if summary is not None:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO summaries (id, summary) VALUES (?, ?)",
+                    [(key, summary) for key in summary_ids]
+                )
+            self._conn.executemany(
+                "INSERT INTO questions (document, chunk, answer, question, mcq, embedding, created_at, summary_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(document, question) DO UPDATE SET mcq = excluded.mcq, summary_id = NULL "
+                "WHERE questions.summary_id IS NOT NULL AND excluded.summary_id IS NULL",
+                rows
+            )
+            self._conn.commit()
+
+    def summary(self, summary_id):
+        """Chunk summary behind the explanation handles of banked MCQs, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT summary FROM summaries WHERE id = ?", (summary_id,)).fetchone()
+        return row[0] if row else None
+
+    def put_explanation(self, summary_id, question, explanation):
+        """Fill in the explanation of banked MCQs that were waiting for it"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, mcq FROM questions WHERE summary_id = ? AND question = ?", (summary_id, question)
+            ).fetchall()
+            if not rows:
+                return
+            updates = []
+            for question_id, mcq in rows:
+                mcq = json.loads(mcq)
+                mcq["explanation"] = explanation
+                mcq.pop("explanation_handle", None)
+                updates.append((json.dumps(mcq), question_id))
+            self._conn.executemany("UPDATE questions SET mcq = ?, summary_id = NULL WHERE id = ?", updates)
+            self._conn.commit()
+
+    def mark_complete(self, document, chunks):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO documents (key, chunks, complete, updated_at) VALUES (?, ?, 1, ?) "
+                "ON CONFLICT(key) DO UPDATE SET chunks = excluded.chunks, complete = 1, updated_at = excluded.updated_at",
+                (document, chunks, time.time())
+            )
+            self._conn.commit()
+
+    def document(self, document):
+        """{"chunks", "complete", "questions"} for a document, or None if it was never generated"""
+        with self._lock:
+            row = self._conn.execute("SELECT chunks, complete FROM documents WHERE key = ?", (document,)).fetchone()
+            if row is None:
+                return None
+            count = self._conn.execute("SELECT COUNT(*) FROM questions WHERE document = ?", (document,)).fetchone()[0]
+        return {"chunks": row[0], "complete": bool(row[1]), "questions": count}
+
+    def sample(self, document, count, topic=None, topic_embedding=None, user_id=None, exclude=()):
+        """Up to count random MCQs of a document, each with its question_id.
+
+        With a topic, only questions whose answer or text contains it, or whose
+        embedding is within topic_threshold of topic_embedding, are sampled. With a
+        user_id, questions served to that user before are left out and the sampled
+        ones are recorded as seen. Question ids in exclude are never sampled.
+        """
+        query = "SELECT id, answer, question, mcq, embedding FROM questions WHERE document = ?"
+        params = [document]
+        if exclude:
+            query += f" AND id NOT IN ({', '.join('?' * len(exclude))})"
+            params.extend(exclude)
+        if user_id:
+            query += " AND id NOT IN (SELECT question_id FROM seen WHERE user_id = ?)"
+            params.append(user_id)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        if topic:
+            rows = [row for row, match in zip(rows, self._topic_matches(rows, topic, topic_embedding)) if match]
+        rows = random.sample(rows, min(count, len(rows)))
+
+        if user_id and rows:
+            now = time.time()
+            with self._lock:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO seen (user_id, question_id, seen_at) VALUES (?, ?, ?)",
+                    [(user_id, row[0], now) for row in rows]
+                )
+                self._conn.commit()
+        return [dict(json.loads(row[3]), question_id=row[0]) for row in rows]
+
+    def _topic_matches(self, rows, topic, topic_embedding=None):
+        needle = topic.lower().strip()
+        matches = [needle in row[1] or needle in row[2].lower() for row in rows]
+        if topic_embedding is not None:
+            target = np.asarray(topic_embedding, dtype=np.float32)
+            target = target / max(float(np.linalg.norm(target)), 1e-12)
+            indexed = [i for i, row in enumerate(rows) if row[4] is not None]
+            if indexed:
+                vectors = np.stack([np.frombuffer(rows[i][4], dtype=np.float32) for i in indexed])
+                similarities = vectors @ target / np.maximum(np.linalg.norm(vectors, axis=1), 1e-12)
+                for i, similarity in zip(indexed, similarities):
+                    matches[i] = matches[i] or similarity >= self.topic_threshold
+        return matches
+
+    def stats(self):
+        with self._lock:
+            documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            questions = self._conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+        return {"documents": documents, "questions": questions}
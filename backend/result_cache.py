@@ -0,0 +1,115 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+
+def normalize_chunk(text):
+    """Collapse whitespace so re-extracted or re-wrapped text maps to the same key"""
+    return " ".join(text.split())
+
+
+class ResultCache:
+    """SQLite-backed cache of per-chunk summaries, keywords and MCQs.
+
+    Entries are keyed by a hash of the normalized chunk text and the generation
+    parameters, so a re-uploaded or lightly edited document only regenerates the
+    chunks whose text changed. Total stored size is bounded; the least recently
+    used entries are evicted first.
+    """
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS chunk_results (
+                    key TEXT PRIMARY KEY,
+                    summary TEXT NOT NULL,
+                    keywords TEXT NOT NULL,
+                    mcqs TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_results_access ON chunk_results(last_access)")
+            self._conn.commit()
+
+    def make_key(self, chunk, params):
+        payload = normalize_chunk(chunk) + "\0" + json.dumps(params, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return {"summary", "keywords", "mcqs"} for a key, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, keywords, mcqs FROM chunk_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE chunk_results SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return {"summary": row[0], "keywords": json.loads(row[1]), "mcqs": json.loads(row[2])}
+
+    def put(self, key, result):
+        summary = result["summary"]
+        keywords = json.dumps(result["keywords"])
+        mcqs = json.dumps(result["mcqs"])
+        size = len(key) + len(summary) + len(keywords) + len(mcqs)
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO chunk_results (key, summary, keywords, mcqs, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, summary, keywords, mcqs, size, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM chunk_results").fetchone()[0]
+        while total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM chunk_results ORDER BY last_access ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM chunk_results WHERE key = ?", (row[0],))
+            total -= row[1]
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM chunk_results"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunk_results")
+            self._conn.commit()
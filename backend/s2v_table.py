@@ -0,0 +1,196 @@
+"""Precomputed Sense2Vec nearest-neighbour table backed by memory-mapped files.
+
+Build it once from the Sense2Vec vectors:
+
+    python s2v_table.py --source models/s2v_old --output models/s2v_table --top-k 10
+
+MCQGenerator then answers get_best_sense/most_similar from the table instead of
+scanning the live vectors, and every worker on the host shares the mapped pages.
+"""
+import os
+import re
+import sys
+import json
+import mmap
+import time
+import bisect
+import argparse
+import numpy as np
+
+TABLE_FILES = ("meta.json", "keys.bin", "offsets.npy", "freqs.npy", "neighbours.npy", "scores.npy")
+
+
+def make_key(word, sense):
+    """Same key format as sense2vec.util.make_key"""
+    return re.sub(r"\s", "_", word) + "|" + sense
+
+
+def table_exists(path):
+    return all(os.path.exists(os.path.join(path, name)) for name in TABLE_FILES)
+
+
+class _SortedKeys:
+    """Sequence view over the sorted, concatenated UTF-8 keys so bisect can search them in place"""
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.blob[int(self.offsets[index]):int(self.offsets[index + 1])]
+
+
+class Sense2VecTable:
+    """Read-only stand-in for Sense2Vec that serves precomputed top-k neighbours"""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.senses = self.meta["senses"]
+        self.top_k = self.meta["top_k"]
+
+        with open(os.path.join(path, "keys.bin"), "rb") as f:
+            self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        self._freqs = np.load(os.path.join(path, "freqs.npy"), mmap_mode="r")
+        self._neighbours = np.load(os.path.join(path, "neighbours.npy"), mmap_mode="r")
+        self._scores = np.load(os.path.join(path, "scores.npy"), mmap_mode="r")
+        self._keys = _SortedKeys(self._blob, self._offsets)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _row(self, key):
+        encoded = key.encode("utf-8")
+        index = bisect.bisect_left(self._keys, encoded)
+        if index < len(self._keys) and self._keys[index] == encoded:
+            return index
+        return None
+
+    def _key(self, row):
+        return self._keys[row].decode("utf-8")
+
+    def __contains__(self, key):
+        return self._row(key) is not None
+
+    def get_freq(self, key, default=None):
+        row = self._row(key)
+        if row is None:
+            return default
+        return int(self._freqs[row])
+
+    def get_best_sense(self, word, senses=tuple(), ignore_case=True):
+        """Same selection rule as Sense2Vec.get_best_sense: the most frequent known sense"""
+        sense_options = senses or self.senses
+        if not sense_options:
+            return None
+        versions = [word, word.upper(), word.title()] if ignore_case else [word]
+        freqs = []
+        for text in versions:
+            for sense in sense_options:
+                key = make_key(text, sense)
+                freq = self.get_freq(key)
+                if freq is not None:
+                    freqs.append((freq, key))
+        return max(freqs)[1] if freqs else None
+
+    def most_similar(self, keys, n=10):
+        """Return up to n precomputed (key, score) neighbours of a single key"""
+        if not isinstance(keys, str):
+            if len(keys) != 1:
+                raise ValueError("Sense2VecTable only supports lookups for a single key")
+            keys = keys[0]
+        row = self._row(keys)
+        if row is None:
+            raise ValueError(f"Can't find key {keys} in table")
+        n = min(n, self.top_k)
+        return [(self._key(int(neighbour)), float(score))
+                for neighbour, score in zip(self._neighbours[row][:n], self._scores[row][:n])
+                if neighbour >= 0]
+
+    def mapped_bytes(self):
+        return (len(self._blob) + self._offsets.nbytes + self._freqs.nbytes +
+                self._neighbours.nbytes + self._scores.nbytes)
+
+
+def build_table(source, output, top_k=10, batch_size=256):
+    """Compute the exact cosine top-k neighbours of every key in a Sense2Vec directory"""
+    from sense2vec import Sense2Vec
+
+    start = time.time()
+    print(f"Loading Sense2Vec vectors from {source}...")
+    s2v = Sense2Vec().from_disk(source)
+
+    # Sort keys by their UTF-8 bytes so lookups can binary search the key blob
+    keys = sorted((key for key, _ in s2v.items()), key=lambda k: k.encode("utf-8"))
+    count = len(keys)
+    dim = s2v.vectors.shape[1]
+    print(f"Building neighbour table for {count} keys ({dim} dimensions)...")
+
+    matrix = np.zeros((count, dim), dtype=np.float32)
+    freqs = np.zeros(count, dtype=np.int64)
+    for row, key in enumerate(keys):
+        matrix[row] = s2v[key]
+        freqs[row] = s2v.get_freq(key, 0) or 0
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+    k = min(top_k, count - 1)
+    neighbours = np.full((count, top_k), -1, dtype=np.int32)
+    scores = np.zeros((count, top_k), dtype=np.float32)
+    if k > 0:
+        for begin in range(0, count, batch_size):
+            end = min(begin + batch_size, count)
+            sims = matrix[begin:end] @ matrix.T
+            # Never return a key as its own neighbour
+            sims[np.arange(end - begin), np.arange(begin, end)] = -np.inf
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(sims, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            neighbours[begin:end, :k] = np.take_along_axis(top, order, axis=1)
+            scores[begin:end, :k] = np.take_along_axis(top_scores, order, axis=1)
+            if (begin // batch_size) % 100 == 0:
+                print(f"  {end}/{count} keys ({time.time() - start:.0f}s)")
+
+    os.makedirs(output, exist_ok=True)
+    encoded = [key.encode("utf-8") for key in keys]
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    with open(os.path.join(output, "keys.bin"), "wb") as f:
+        for e in encoded:
+            f.write(e)
+    np.save(os.path.join(output, "offsets.npy"), offsets)
+    np.save(os.path.join(output, "freqs.npy"), freqs)
+    np.save(os.path.join(output, "neighbours.npy"), neighbours)
+    np.save(os.path.join(output, "scores.npy"), scores)
+    with open(os.path.join(output, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "source": os.path.abspath(source),
+            "senses": list(s2v.senses),
+            "top_k": top_k,
+            "count": count
+        }, f, indent=2)
+
+    print(f"Neighbour table written to {output} in {time.time() - start:.0f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute a memory-mapped Sense2Vec neighbour table")
+    parser.add_argument("--source", default="models/s2v_old", help="Sense2Vec directory to read")
+    parser.add_argument("--output", default="models/s2v_table", help="Directory to write the table to")
+    parser.add_argument("--top-k", type=int, default=10, help="Neighbours stored per key")
+    parser.add_argument("--batch-size", type=int, default=256, help="Keys scored per matrix multiply")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.source):
+        print(f"Sense2Vec directory not found: {args.source}")
+        return 1
+    build_table(args.source, args.output, top_k=args.top_k, batch_size=args.batch_size)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import random
+import contextvars
+from contextlib import contextmanager
+
+# (seed, chunk index) of the chunk being processed in this thread, see seeded_chunk()
+_current_chunk_seed = contextvars.ContextVar("mcq_chunk_seed", default=None)
+
+
+def seeded_random(seed, *keys):
+    """A random.Random derived from seed and keys.
+
+    String seeds are hashed with SHA-512, so the sequence is the same in every
+    process and run, regardless of PYTHONHASHSEED.
+    """
+    return random.Random(":".join(str(part) for part in (seed,) + keys))
+
+
+@contextmanager
+def seeded_chunk(seed, chunk_index):
+    """Derive chunk_random() in this block from seed and the chunk index; a None seed leaves it unseeded"""
+    token = _current_chunk_seed.set(None if seed is None else (seed, chunk_index))
+    try:
+        yield
+    finally:
+        _current_chunk_seed.reset(token)
+
+
+def chunk_seeded():
+    """Whether the current chunk is seeded"""
+    return _current_chunk_seed.get() is not None
+
+
+def chunk_random(*keys):
+    """RNG for one random choice in the current chunk, e.g. chunk_random("options", answer).
+
+    In a seeded chunk every call gets a fresh RNG for its keys, so a choice does not
+    depend on how many were made before it or in which order. Unseeded, it is the
+    random module itself.
+    """
+    current = _current_chunk_seed.get()
+    if current is None:
+        return random
+    return seeded_random(*current, *keys)
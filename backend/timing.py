@@ -0,0 +1,91 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from metrics import STAGE_SECONDS, FAILURES, DEDUP_SKIPPED
+
+# Telemetry of the chunk being processed in this thread, see collect_telemetry()
+_current_telemetry = contextvars.ContextVar("mcq_chunk_telemetry", default=None)
+
+
+class StageTimer:
+    """Accumulates wall time and call counts per named pipeline stage"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = {}
+        self.calls = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds, calls=1):
+        with self._lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+            self.calls[name] = self.calls.get(name, 0) + calls
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {"seconds": round(seconds, 4), "calls": self.calls[name]}
+                for name, seconds in self.seconds.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self.seconds = {}
+            self.calls = {}
+
+
+@contextmanager
+def collect_telemetry():
+    """Collect the spans, failures and skipped duplicates recorded on this thread into a picklable dict.
+
+    Chunks may run in forked workers, so telemetry travels back with the chunk
+    result and is recorded into metrics and timers by the parent.
+    """
+    telemetry = {"spans": [], "failures": {}, "skipped": {}}
+    token = _current_telemetry.set(telemetry)
+    try:
+        yield telemetry
+    finally:
+        _current_telemetry.reset(token)
+
+
+@contextmanager
+def span(name):
+    """Time a block as a named span of the current chunk, or straight into the metrics outside one"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        telemetry = _current_telemetry.get()
+        if telemetry is not None:
+            telemetry["spans"].append((name, seconds))
+        else:
+            STAGE_SECONDS.observe(seconds, stage=name)
+
+
+def count_failure(stage):
+    """Count an error that was caught and skipped in the current chunk"""
+    telemetry = _current_telemetry.get()
+    if telemetry is not None:
+        telemetry["failures"][stage] = telemetry["failures"].get(stage, 0) + 1
+    else:
+        FAILURES.inc(stage=stage)
+
+
+def count_skipped(stage, amount=1):
+    """Count near-duplicates skipped in the current chunk, i.e. generations avoided"""
+    if not amount:
+        return
+    telemetry = _current_telemetry.get()
+    if telemetry is not None:
+        telemetry["skipped"][stage] = telemetry["skipped"].get(stage, 0) + amount
+    else:
+        DEDUP_SKIPPED.inc(amount, stage=stage)
@@ -10,6 +10,7 @@ interface QuizCardProps {
   onAnswer: (answer: UserAnswer) => void;
   onNext: () => void;
   onPrevious: () => void;
+  explanationLoading?: boolean;
 }
 
 export default function QuizCard({
@@ -20,6 +21,7 @@ export default function QuizCard({
   onAnswer,
   onNext,
   onPrevious,
+  explanationLoading = false,
 }: QuizCardProps) {
   const [showExplanation, setShowExplanation] = useState(false);
   const [timeSpent, setTimeSpent] = useState(0);
@@ -94,7 +96,9 @@ export default function QuizCard({
             <AlertCircle className="text-blue-500 mt-1" size={20} />
             <div>
               <h3 className="font-semibold text-blue-900">Explanation</h3>
-              <p className="text-blue-800">{question.explanation}</p>
+              <p className="text-blue-800">
+                {explanationLoading ? 'Generating explanation...' : question.explanation}
+              </p>
             </div>
           </div>
           <button
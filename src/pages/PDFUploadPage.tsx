@@ -13,6 +13,10 @@ export default function PDFUploadPage() {
   const [text, setText] = useState<string>('');
   const [isLoading, setIsLoading] = useState<boolean>(false);
   const [inputType, setInputType] = useState<'file' | 'text'>('file');
+  const [streamedQuestions, setStreamedQuestions] = useState<Question[]>([]);
+  // total is null while a PDF is still being extracted and its section count is unknown
+  const [progress, setProgress] = useState<{ done: number; total: number | null } | null>(null);
+  const [pages, setPages] = useState<string>('');
   const navigate = useNavigate();
 
   const onDrop = useCallback((acceptedFiles: File[]) => {
@@ -36,6 +40,7 @@ export default function PDFUploadPage() {
 
   const removeFile = () => {
     setFile(null);
+    setPages('');
   };
 
   const handleTextChange = (e: React.ChangeEvent<HTMLTextAreaElement>) => {
@@ -49,44 +54,88 @@ export default function PDFUploadPage() {
     }
 
     setIsLoading(true);
+    setStreamedQuestions([]);
+    setProgress(null);
     const formData = new FormData();
     
     if (inputType === 'file' && file) {
       formData.append('file', file);
+      if (pages.trim()) {
+        formData.append('pages', pages.trim());
+      }
     } else if (inputType === 'text' && text) {
       formData.append('text', text);
     }
 
     // Add parameters
     formData.append('questionsPerChunk', '3');
-    formData.append('chunkSize', '2000');
-    formData.append('overlap', '200');
+    // Chunk size and overlap are measured in model tokens
+    formData.append('chunkSize', '512');
+    formData.append('overlap', '50');
+    // Explanations are generated on demand when a question is answered
+    formData.append('explanations', 'lazy');
 
     try {
-      const response = await fetch(`${API_URL}/generate-mcq`, {
+      // The stream endpoint sends one NDJSON line per finished chunk
+      const response = await fetch(`${API_URL}/generate-mcq/stream`, {
         method: 'POST',
         body: formData,
       });
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         const errorData = await response.json();
         throw new Error(errorData.error || 'Failed to generate quiz');
       }
 
-      const data = await response.json();
+      const questions: Question[] = [];
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+
+      const handleLine = (line: string) => {
+        if (!line.trim()) return;
+        const data = JSON.parse(line);
+        if (data.error) {
+          throw new Error(data.error);
+        }
+        if (data.mcqs) {
+          // Transform the MCQs to match our Question interface
+          questions.push(...data.mcqs.map((mcq: any) => ({
+            id: uuidv4(),
+            text: mcq.question,
+            options: mcq.options,
+            correctAnswer: mcq.correct_index,
+            explanation: mcq.explanation ?? '',
+            explanationHandle: mcq.explanation_handle ? {
+              summaryId: mcq.explanation_handle.summary_id,
+              question: mcq.explanation_handle.question,
+              answer: mcq.explanation_handle.answer
+            } : undefined
+          })));
+          setStreamedQuestions([...questions]);
+          setProgress({ done: data.chunk + 1, total: data.total_chunks });
+        }
+      };
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop() ?? '';
+        lines.forEach(handleLine);
+      }
+      handleLine(buffer);
       
-      if (!data.mcqs || data.mcqs.length === 0) {
+      if (questions.length === 0) {
         throw new Error('No questions could be generated from the provided content');
       }
 
-      // Transform the MCQs to match our Question interface
-      const questions: Question[] = data.mcqs.map((mcq: any) => ({
-        id: uuidv4(),
-        text: mcq.question,
-        options: mcq.options,
-        correctAnswer: mcq.correct_index,
-        explanation: mcq.explanation
-      }));
+      // Questions arrive in document order, so shuffle them here
+      for (let i = questions.length - 1; i > 0; i--) {
+        const j = Math.floor(Math.random() * (i + 1));
+        [questions[i], questions[j]] = [questions[j], questions[i]];
+      }
 
       // Create a new quiz
       const quiz: Quiz = {
@@ -179,6 +228,22 @@ export default function PDFUploadPage() {
               </button>
             </div>
           )}
+
+          {file?.name.toLowerCase().endsWith('.pdf') && (
+            <div className="space-y-2">
+              <label htmlFor="pdf-pages" className="block text-sm font-medium text-gray-700">
+                Pages (optional)
+              </label>
+              <input
+                id="pdf-pages"
+                type="text"
+                className="w-full rounded-lg border border-gray-300 p-2 focus:border-blue-500 focus:ring focus:ring-blue-200 focus:ring-opacity-50"
+                placeholder="All pages, or e.g. 1-5, 8, 12-"
+                value={pages}
+                onChange={(e) => setPages(e.target.value)}
+              />
+            </div>
+          )}
         </>
       ) : (
         <div className="space-y-2">
@@ -217,6 +282,36 @@ export default function PDFUploadPage() {
           'Generate Quiz'
         )}
       </button>
+
+      {isLoading && (progress || streamedQuestions.length > 0) && (
+        <div className="bg-white rounded-lg p-4 space-y-3">
+          {progress && (
+            <div>
+              <div className="flex justify-between text-sm text-gray-600 mb-1">
+                <span>
+                  {progress.total !== null
+                    ? `Processed ${progress.done} of ${progress.total} sections`
+                    : `Processed ${progress.done} sections`}
+                </span>
+                <span>{streamedQuestions.length} questions so far</span>
+              </div>
+              <div className="w-full bg-gray-200 rounded-full h-2">
+                <div
+                  className={`bg-blue-600 h-2 rounded-full transition-all ${progress.total === null ? 'animate-pulse' : ''}`}
+                  style={{ width: progress.total !== null ? `${(progress.done / Math.max(progress.total, 1)) * 100}%` : '100%' }}
+                />
+              </div>
+            </div>
+          )}
+          <ul className="space-y-2">
+            {streamedQuestions.slice(0, 5).map((question) => (
+              <li key={question.id} className="text-sm text-gray-700 border-l-4 border-blue-200 pl-3">
+                {question.text}
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
     </div>
   );
 }
\ No newline at end of file
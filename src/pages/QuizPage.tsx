@@ -5,6 +5,8 @@ import type { Question, UserAnswer, QuizAttempt, Quiz } from '../types';
 import { saveQuizAttempt } from '../utils/storage';
 import { v4 as uuidv4 } from 'uuid';
 
+const API_URL = 'http://localhost:5000/api';
+
 // Default quizzes
 const defaultQuizzes: Record<string, { title: string, questions: Question[] }> = {
   '1': {
@@ -418,6 +420,8 @@ export default function QuizPage() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [startTime, setStartTime] = useState(Date.now());
+  const [explanations, setExplanations] = useState<Record<string, string>>({});
+  const [loadingExplanations, setLoadingExplanations] = useState<Record<string, boolean>>({});
 
   useEffect(() => {
     const loadQuiz = async () => {
@@ -475,11 +479,58 @@ export default function QuizPage() {
     setQuizComplete(false);
     setShowSubmitConfirm(false);
     setStartTime(Date.now());
+    setExplanations({});
+    setLoadingExplanations({});
   }, [id]);
 
   const questions = quiz?.questions || [];
 
+  // Keep fetched explanations with the saved quiz so they are not requested again
+  const saveExplanation = (questionId: string, explanation: string) => {
+    const savedQuizzes = JSON.parse(localStorage.getItem('quizzes') || '[]') as Quiz[];
+    const updatedQuizzes = savedQuizzes.map(q => q.id !== id ? q : {
+      ...q,
+      questions: q.questions.map(question =>
+        question.id === questionId ? { ...question, explanation } : question
+      )
+    });
+    localStorage.setItem('quizzes', JSON.stringify(updatedQuizzes));
+  };
+
+  const fetchExplanation = async (question: Question) => {
+    if (!question.explanationHandle || question.explanation || explanations[question.id] || loadingExplanations[question.id]) {
+      return;
+    }
+
+    setLoadingExplanations(prev => ({ ...prev, [question.id]: true }));
+    try {
+      const { summaryId, question: text, answer } = question.explanationHandle;
+      const response = await fetch(`${API_URL}/explanations`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ handles: [{ summary_id: summaryId, question: text, answer }] }),
+      });
+      const data = await response.json();
+      const result = data.explanations?.[0];
+      const explanation = result?.explanation || 'No explanation is available for this question.';
+      setExplanations(prev => ({ ...prev, [question.id]: explanation }));
+      if (result?.explanation) {
+        saveExplanation(question.id, explanation);
+      }
+    } catch (err) {
+      console.error('Error fetching explanation:', err);
+      setExplanations(prev => ({ ...prev, [question.id]: 'The explanation could not be loaded.' }));
+    } finally {
+      setLoadingExplanations(prev => ({ ...prev, [question.id]: false }));
+    }
+  };
+
   const handleAnswer = (answer: UserAnswer) => {
+    const question = questions.find(q => q.id === answer.questionId);
+    if (question) {
+      fetchExplanation(question);
+    }
+
     const existingAnswerIndex = answers.findIndex(a => a.questionId === answer.questionId);
     if (existingAnswerIndex !== -1) {
       const newAnswers = [...answers];
@@ -638,7 +689,11 @@ export default function QuizPage() {
   return (
     <div className="max-w-4xl mx-auto space-y-6">
       <QuizCard
-        question={questions[currentQuestionIndex]}
+        question={{
+          ...questions[currentQuestionIndex],
+          explanation: explanations[questions[currentQuestionIndex].id] ?? questions[currentQuestionIndex].explanation
+        }}
+        explanationLoading={loadingExplanations[questions[currentQuestionIndex].id]}
         currentIndex={currentQuestionIndex}
         totalQuestions={questions.length}
         onAnswer={handleAnswer}
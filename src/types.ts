@@ -1,9 +1,17 @@
+export interface ExplanationHandle {
+  summaryId: string;
+  question: string;
+  answer: string;
+}
+
 export interface Question {
   id: string;
   text: string;
   options: string[];
   correctAnswer: number;
   explanation: string;
+  // Set for generated questions whose explanation is fetched from the API on demand
+  explanationHandle?: ExplanationHandle;
 }
 
 export interface Quiz {